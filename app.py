@@ -1,11 +1,19 @@
 import streamlit as st
 import os
-import mysql.connector
+import io
+import json
 from passlib.hash import pbkdf2_sha256
 import tempfile
-from github import Github # Import untuk integrasi GitHub
-from cryptography.fernet import Fernet # Import untuk enkripsi token GitHub
+import itertools
 import singbox_converter # Pastikan ini di-import jika singbox_converter.py ada
+import subscription_fetcher
+import mysql_pool
+import ttl_cache
+import github_repo
+import conversion_artifacts
+import conversion_jobs
+# mysql.connector, github (PyGithub) dan cryptography di-import saat pertama kali dipakai,
+# supaya halaman yang nggak butuh mereka nggak ikut nanggung waktu import-nya
 
 # --- Konfigurasi Awal Aplikasi Streamlit ---
 st.set_page_config(
@@ -39,30 +47,54 @@ if 'selected_github_dir' not in st.session_state:
     st.session_state.selected_github_dir = ""
 if 'selected_file_or_dir' not in st.session_state:
     st.session_state.selected_file_or_dir = "(Buat file baru di sini)"
+# Artifact hasil konversi terakhir (lihat conversion_artifacts), bertahan antar rerun
+if 'conversion_artifact' not in st.session_state:
+    st.session_state.conversion_artifact = None
+# Job konversi background yang sedang ditunggu (lihat conversion_jobs) dan pesan hasil akhirnya
+if 'conversion_job_id' not in st.session_state:
+    st.session_state.conversion_job_id = None
+if 'conversion_notice' not in st.session_state:
+    st.session_state.conversion_notice = None
 
 # --- Fungsi Enkripsi/Dekripsi untuk Token GitHub ---
 # PENTING: Kunci enkripsi harus diambil dari Streamlit Secrets
 # Untuk pengujian lokal pertama kali jika secrets belum diset, bisa generate sementara.
 # NAMUN, DI PRODUCTION/DEPLOYMENT, KUNCI INI HARUS PERSISTEN DARI SECRETS.
-try:
-    ENCRYPTION_KEY = st.secrets["encryption_key"].encode()
-    cipher_suite = Fernet(ENCRYPTION_KEY)
-except (KeyError, AttributeError):
+@st.cache_resource
+def get_cipher_suite():
+    """
+    Builds the Fernet cipher once per process.
+    Returns (cipher_suite, generated_key); generated_key is set only when the secret is missing.
+    """
+    from cryptography.fernet import Fernet
+    try:
+        return Fernet(st.secrets["encryption_key"].encode()), None
+    except (KeyError, AttributeError):
+        # Fallback untuk pengembangan/debug lokal jika kunci tidak diset (TIDAK AMAN UNTUK PRODUKSI)
+        # Kunci sementara ini tetap sama selama proses hidup, jadi token yang sudah dienkripsi masih bisa didekripsi antar rerun
+        generated_key = Fernet.generate_key()
+        return Fernet(generated_key), generated_key
+
+def encryption_key_configured():
+    # Cek secrets saja, cryptography baru di-import saat token pertama kali dienkripsi/didekripsi
+    try:
+        return bool(st.secrets["encryption_key"])
+    except (KeyError, AttributeError):
+        return False
+
+if not encryption_key_configured():
+    _, ENCRYPTION_KEY_GENERATED = get_cipher_suite()
     st.error("⚠️ Kunci enkripsi 'encryption_key' tidak ditemukan di Streamlit Secrets. Pastikan Anda telah mengaturnya.")
-    # Fallback untuk pengembangan/debug lokal jika kunci tidak diset (TIDAK AMAN UNTUK PRODUKSI)
     st.info("Menggunakan kunci enkripsi sementara (tidak persisten). Harap set 'encryption_key' di Streamlit Secrets Anda.")
     # Sebaiknya, hentikan aplikasi jika kunci tidak ditemukan di production
-    # Untuk demonstasi, kita akan generate kunci sementara
-    ENCRYPTION_KEY = Fernet.generate_key() # Generate kunci sementara (tidak persisten)
-    cipher_suite = Fernet(ENCRYPTION_KEY)
-    st.code(f"Kunci enkripsi yang perlu Anda tambahkan ke Streamlit Secrets:\nencryption_key = \"{ENCRYPTION_KEY.decode()}\"")
+    st.code(f"Kunci enkripsi yang perlu Anda tambahkan ke Streamlit Secrets:\nencryption_key = \"{ENCRYPTION_KEY_GENERATED.decode()}\"")
 
 
 def encrypt_data(data):
     if not data:
         return ""
     try:
-        return cipher_suite.encrypt(data.encode('utf-8')).decode('utf-8')
+        return get_cipher_suite()[0].encrypt(data.encode('utf-8')).decode('utf-8')
     except Exception as e:
         st.error(f"Error saat enkripsi data: {e}")
         return ""
@@ -71,36 +103,59 @@ def decrypt_data(data):
     if not data:
         return ""
     try:
-        return cipher_suite.decrypt(data.encode('utf-8')).decode('utf-8')
+        return get_cipher_suite()[0].decrypt(data.encode('utf-8')).decode('utf-8')
     except Exception as e:
         st.error(f"Error saat dekripsi data: {e}. Token mungkin tidak valid atau kunci enkripsi berubah.")
         return ""
 
 # --- Fungsi Koneksi Database MySQL Aiven ---
-def get_mysql_connection():
-    """Mendapatkan koneksi ke database MySQL Aiven menggunakan st.secrets."""
-    conn = None
-    ca_cert_path = None
-
+def write_ssl_ca_file(ca_content):
+    """Menulis SSL CA ke file sementara (atomic), dilewati kalau isinya sudah sama."""
+    ca_cert_path = os.path.join(tempfile.gettempdir(), "aiven_ca.pem") # Dapatkan direktori temp sistem (misal /tmp di Linux)
     try:
-        # Menulis SSL CA content ke file sementara jika disediakan di st.secrets
-        if "ssl_ca_content" in st.secrets.get("mysql", {}): # Gunakan .get() untuk keamanan
-            temp_dir = tempfile.gettempdir() # Dapatkan direktori temp sistem (misal /tmp di Linux)
-            ca_cert_path = os.path.join(temp_dir, "aiven_ca.pem") # Nama file sementara
-
-            with open(ca_cert_path, "w") as f:
-                f.write(st.secrets["mysql"]["ssl_ca_content"])
-            # st.info(f"CA certificate ditulis ke file sementara: {ca_cert_path}") # Debugging info, bisa dihapus
-
-        conn = mysql.connector.connect(
-            host=st.secrets["mysql"]["host"],
-            port=st.secrets["mysql"]["port"],
-            user=st.secrets["mysql"]["user"],
-            password=st.secrets["mysql"]["password"],
-            database=st.secrets["mysql"]["database"],
+        with open(ca_cert_path, "r") as f:
+            if f.read() == ca_content:
+                return ca_cert_path
+    except OSError:
+        pass
+    with tempfile.NamedTemporaryFile("w", dir=os.path.dirname(ca_cert_path), delete=False, suffix=".pem") as f:
+        f.write(ca_content)
+    os.replace(f.name, ca_cert_path)
+    return ca_cert_path
+
+@st.cache_resource(show_spinner=False)
+def get_mysql_pool():
+    """
+    Pool koneksi MySQL satu per proses. SSL CA cuma ditulis sekali di sini, dan koneksi
+    dipakai ulang antar rerun/user jadi login nggak perlu handshake TCP+TLS+auth berkali-kali.
+    Kalau gagal (misal secrets belum diset) exception-nya naik dan nggak di-cache.
+    """
+    import mysql.connector
+
+    mysql_secrets = st.secrets["mysql"]
+    ca_cert_path = None
+    # Menulis SSL CA content ke file sementara jika disediakan di st.secrets
+    if "ssl_ca_content" in mysql_secrets:
+        ca_cert_path = write_ssl_ca_file(mysql_secrets["ssl_ca_content"])
+
+    def connect():
+        return mysql.connector.connect(
+            host=mysql_secrets["host"],
+            port=mysql_secrets["port"],
+            user=mysql_secrets["user"],
+            password=mysql_secrets["password"],
+            database=mysql_secrets["database"],
             ssl_ca=ca_cert_path
         )
-        return conn
+    return mysql_pool.MySQLConnectionPool(connect)
+
+def get_mysql_connection():
+    """
+    Meminjam koneksi ke database MySQL Aiven dari pool.
+    conn.close() mengembalikan koneksi ke pool, bukan menutupnya.
+    """
+    try:
+        return get_mysql_pool().acquire()
     except Exception as e:
         if "mysql" not in st.secrets:
             st.error("❌ Kredensial MySQL tidak ditemukan di Streamlit Secrets. Pastikan Anda telah mengaturnya di 'Advanced settings' aplikasi.")
@@ -109,7 +164,7 @@ def get_mysql_connection():
         return None
 
 def init_db():
-    """Menginisialisasi tabel users jika belum ada di MySQL."""
+    """Menginisialisasi tabel users jika belum ada di MySQL. Returns True kalau berhasil."""
     conn = get_mysql_connection()
     if conn:
         try:
@@ -125,16 +180,29 @@ def init_db():
                 )
             ''')
             conn.commit()
+            return True
         except Exception as e:
             st.error(f"Error saat inisialisasi tabel database: {e}")
         finally:
             if conn:
                 conn.close()
+    return False
+
+@st.cache_resource(show_spinner=False)
+def init_db_once():
+    """
+    Runs init_db() once per process instead of on every rerun.
+    A failed bootstrap raises, so it is not cached and the next rerun tries again.
+    """
+    if not init_db():
+        raise RuntimeError("Inisialisasi database gagal.")
+    return True
 
 def add_user(username, password):
     """Menambahkan user baru ke database MySQL."""
     conn = get_mysql_connection()
     if conn:
+        import mysql.connector # Sudah di-load get_mysql_connection, ini cuma ambil dari sys.modules
         try:
             c = conn.cursor()
             password_hash = pbkdf2_sha256.hash(password)
@@ -207,6 +275,8 @@ def update_user_settings(username, github_token_encrypted, github_repo_name):
                 WHERE username = %s
             """, (github_token_encrypted, github_repo_name, username))
             conn.commit()
+            # Cuma cache settings user ini yang dibuang, user lain nggak kena
+            get_user_settings_cache().invalidate(username)
             return True
         except Exception as e:
             st.error(f"Error saat mengupdate pengaturan user: {e}")
@@ -216,37 +286,139 @@ def update_user_settings(username, github_token_encrypted, github_repo_name):
                 conn.close()
     return False
 
-# Panggil inisialisasi database saat aplikasi dimulai
-init_db()
+# --- Cache pengaturan user (token sudah didekripsi), per username ---
+USER_SETTINGS_TTL = 300 # Detik
+USER_SETTINGS_CACHE_MAX_ENTRIES = 1024
+
+@st.cache_resource
+def get_user_settings_cache():
+    # Satu cache per proses, dipakai bersama semua session; tiap entry per username
+    return ttl_cache.TTLCache(ttl=USER_SETTINGS_TTL, max_entries=USER_SETTINGS_CACHE_MAX_ENTRIES)
+
+def load_user_settings(username):
+    """
+    Returns {"github_token": <decrypted>, "github_repo_name": ...} for username, or None.
+    Cached per user for USER_SETTINGS_TTL seconds, so repeated logins skip the DB round trip
+    and the Fernet decrypt; update_user_settings() invalidates only that user's entry.
+    """
+    def load():
+        user_settings = get_user_settings(username)
+        if not user_settings:
+            return None # Error/user nggak ada: jangan di-cache
+        return {
+            "github_token": decrypt_data(user_settings['github_token_encrypted']),
+            "github_repo_name": user_settings['github_repo_name'],
+        }
+    settings = get_user_settings_cache().get_or_load(username, load)
+    return dict(settings) if settings else None
+
+# Inisialisasi database sekali per proses (bukan tiap rerun Streamlit)
+try:
+    init_db_once()
+except RuntimeError:
+    pass # Error-nya sudah ditampilkan oleh init_db/get_mysql_connection
 
 # --- Fungsi untuk membaca template dari file ---
 def load_template_from_file(file_path="singbox-template.txt"):
-    if os.path.exists(file_path):
-        with open(file_path, "r") as f:
-            return f.read()
-    else:
+    # Template di-parse sekali per proses (CompiledTemplate), otomatis dimuat ulang kalau mtime/isi file berubah
+    try:
+        return singbox_converter.load_compiled_template(file_path)
+    except ValueError as e:
+        st.error(f"⚠️ Template '{file_path}' bukan JSON yang valid: {e}")
         return None
 
+# --- Fetcher subscription, satu per proses ---
+@st.cache_resource
+def get_subscription_fetcher():
+    # Pool koneksi keep-alive dan cache ETag/Last-Modified dipakai bersama antar rerun dan user
+    return subscription_fetcher.SubscriptionFetcher()
+
+# --- Store artifact hasil konversi, satu per proses ---
+@st.cache_resource
+def get_artifact_store():
+    # Dipakai bersama semua session, jadi input yang sama cukup dikonversi sekali
+    return conversion_artifacts.ArtifactStore()
+
+# --- Job konversi di background, satu runner per proses ---
+CONVERSION_WORKERS = 2 # Konversi yang jalan bersamaan di seluruh server
+CONVERSION_JOBS_PER_USER = 1
+CONVERSION_POLL_INTERVAL = 0.5 # Detik antar update progress bar
+# Link hasil parse yang diingat semua job; outbound jauh lebih besar dari link-nya, jadi dibatasi
+OUTBOUND_CACHE_ENTRIES = 50000
+
+@st.cache_resource
+def get_job_runner():
+    # Cache outbound cuma di memori: link yang sudah pernah dikonversi (user mana pun) nggak di-parse ulang
+    return conversion_jobs.ConversionJobRunner(
+        get_artifact_store(), max_workers=CONVERSION_WORKERS, per_user_limit=CONVERSION_JOBS_PER_USER,
+        cache=singbox_converter.OutboundCache(max_entries=OUTBOUND_CACHE_ENTRIES)
+    )
+
+def conversion_owner():
+    # Batas job dihitung per username; user yang belum login dihitung per session browser
+    if st.session_state.logged_in and st.session_state.username:
+        return st.session_state.username
+    if 'anonymous_owner' not in st.session_state:
+        st.session_state.anonymous_owner = f"anon-{os.urandom(8).hex()}"
+    return st.session_state.anonymous_owner
+
+@st.fragment(run_every=CONVERSION_POLL_INTERVAL)
+def conversion_progress():
+    """Progress bar job konversi yang lagi jalan; cuma fragment ini yang di-rerun selama menunggu."""
+    runner = get_job_runner()
+    job = runner.get(st.session_state.conversion_job_id)
+    if job is None:
+        st.session_state.conversion_job_id = None
+        st.rerun()
+    if job.active:
+        # File upload belum ketahuan jumlah link-nya, progress-nya dari byte yang sudah dibaca
+        count = f"{job.processed}/{job.total}" if job.total is not None else f"{job.processed:,}"
+        st.progress(job.progress, text=f"Konversi ({job.stage}): {count} link")
+        if st.button("✖️ Batalkan Konversi", key="cancel_conversion"):
+            job.cancel()
+        return
+
+    runner.forget(job.id)
+    st.session_state.conversion_job_id = None
+    if job.state == conversion_jobs.DONE:
+        st.session_state.conversion_artifact = job.artifact
+    elif job.state == conversion_jobs.CANCELLED:
+        st.session_state.conversion_notice = ("warning", "⚠️ Konversi dibatalkan.")
+    else:
+        st.session_state.conversion_artifact = None
+        st.session_state.conversion_notice = ("error", f"❌ Gagal konversi: {job.error}")
+    st.rerun() # Rerun full halaman supaya hasil (atau pesan error) tampil
+
 # --- Fungsi untuk membaca isi repositori GitHub ---
-@st.cache_data(ttl=300) # Cache hasil selama 5 menit
-def list_repo_contents_cached(token, repo_name, path=""):
+@st.cache_resource
+def get_repo_handles():
+    # Client Github, handle repo dan index tree per (hash token, repo) dipakai bersama antar rerun.
+    # GITHUB_API_URL bisa diarahkan ke GitHub Enterprise atau fake API lokal buat testing.
+    return github_repo.RepoHandleCache(base_url=os.environ.get("GITHUB_API_URL"))
+
+def invalidate_repo_contents(token, repo_name):
+    """Paksa cek ulang head branch repo saat listing berikutnya (misal setelah refresh atau upload file)."""
+    get_repo_handles().mark_stale(token, repo_name)
+
+def invalidate_repo_contents_for_token(token):
+    """Buang client, handle repo dan index milik satu token (misal saat logout)."""
+    return get_repo_handles().forget_token(token)
+
+def list_repo_contents(token, repo_name, path=""):
     """
-    Membaca isi direktori (file/folder) dari repositori GitHub.
+    Membaca isi direktori (file/folder) dari repositori GitHub, lewat index tree repo (satu request
+    tree rekursif per head branch). Tree cuma di-fetch ulang kalau SHA head branch berubah; navigasi
+    antar folder nggak hit API.
     Mengembalikan list dari dict berisi {'name': 'file_name', 'path': 'full/path/to/file', 'type': 'file'/'dir'}
     """
     try:
-        g = Github(token)
-        repo = g.get_repo(repo_name)
-        
-        contents = repo.get_contents(path, ref="main") # Asumsi branch 'main'
-        
-        # Filter hanya file dan direktori, bukan submodule atau symlink
-        filtered_contents = []
-        for item in contents:
-            if item.type == "file" or item.type == "dir":
-                filtered_contents.append({'name': item.name, 'path': item.path, 'type': item.type})
-        
-        return {"status": "success", "contents": filtered_contents}
+        index = get_repo_handles().get_index(token, repo_name) # Asumsi branch 'main'
+        index.ensure_fresh()
+        contents = index.children(path)
+        if contents is None:
+            return {"status": "error", "message": f"Path '{repo_name}/{path}' tidak ditemukan di branch {index.branch}."}
+        # Submodule dan symlink sudah disaring oleh index, jadi isinya cuma file dan direktori
+        return {"status": "success", "contents": contents}
     except Exception as e:
         # Handle cases like repo not found, token invalid, path not found
         if "Not Found" in str(e) or "Bad credentials" in str(e):
@@ -254,30 +426,112 @@ def list_repo_contents_cached(token, repo_name, path=""):
         return {"status": "error", "message": f"Gagal membaca isi repo GitHub: {e}"}
 
 # --- Fungsi untuk update config ke GitHub ---
-def update_config_to_github(token, repo_name, file_path, content):
+def update_config_to_github(token, repo_name, file_path, content, compressed_content=None, compression="gzip"):
+    """
+    Upload config ke GitHub. Kalau compressed_content diisi, versi terkompresinya (file_path + .gz/.zst)
+    ikut di-commit bareng file biasa dalam satu commit, jadi client nggak pernah lihat pasangan yang beda versi.
+    """
     try:
-        g = Github(token)
-        repo = g.get_repo(repo_name)
-        
-        # Cek apakah file sudah ada atau belum
-        try:
-            # Dapatkan konten file yang sudah ada
-            contents = repo.get_contents(file_path, ref="main") # Asumsi branch 'main'
-            # Jika file ada, update isinya
-            repo.update_file(contents.path, "Update config dari Swiss Army VPN Tools", content, contents.sha, branch="main")
-            st.success(f"✅ Config berhasil diupdate di GitHub: `{repo_name}/{file_path}`")
-        except Exception as e:
-            # Jika file belum ada, buat file baru
-            if "Not Found" in str(e) or "404" in str(e): # GitHub API returns 404 if file not found
-                repo.create_file(file_path, "Upload config dari Swiss Army VPN Tools", content, branch="main")
-                st.success(f"✅ Config berhasil diupload baru di GitHub: `{repo_name}/{file_path}`")
-            else:
-                st.error(f"❌ Error saat mengakses atau mengupdate file di GitHub: {e}")
-                st.info("Pastikan Nama Repositori GitHub dan Path File Config benar, serta token lo punya izin 'repo' (full control of private repositories).")
-
+        repo = get_repo_handles().get_repo(token, repo_name) # Client dan handle repo di-cache per token/repo
     except Exception as e:
         st.error(f"❌ Gagal koneksi atau otentikasi GitHub: {e}")
         st.info("Cek lagi Personal Access Token GitHub lo di halaman 'Login & Pengaturan Akun', tod! Pastikan punya izin 'repo' (Full control of private repositories).")
+        return
+
+    try:
+        if compressed_content is not None:
+            compressed_path = file_path + singbox_converter.COMPRESSION_EXTENSIONS[compression]
+            result = github_repo.publish_files(
+                repo, {file_path: content, compressed_path: compressed_content},
+                "Update config dari Swiss Army VPN Tools",
+                branch="main" # Asumsi branch 'main'
+            )
+        else:
+            # Kalau isi file di repo sudah sama persis (SHA blob sama), nggak ada commit baru
+            result = github_repo.upload_file(
+                repo, file_path, content,
+                "Update config dari Swiss Army VPN Tools",
+                branch="main", # Asumsi branch 'main'
+                create_message="Upload config dari Swiss Army VPN Tools"
+            )
+    except Exception as e:
+        st.error(f"❌ Error saat mengakses atau mengupdate file di GitHub: {e}")
+        st.info("Pastikan Nama Repositori GitHub dan Path File Config benar, serta token lo punya izin 'repo' (full control of private repositories).")
+        return
+
+    if result["action"] == "unchanged":
+        st.info(f"ℹ️ Config di GitHub sudah sama persis, nggak ada commit baru: `{repo_name}/{file_path}`")
+        return
+    invalidate_repo_contents(token, repo_name) # Head branch berubah
+    if result["action"] == "committed":
+        files = ", ".join(f"`{path}`" for path in result["changed"])
+        st.success(f"✅ Config berhasil di-commit ke GitHub `{repo_name}`: {files}")
+    elif result["action"] == "updated":
+        st.success(f"✅ Config berhasil diupdate di GitHub: `{repo_name}/{file_path}`")
+    else:
+        st.success(f"✅ Config berhasil diupload baru di GitHub: `{repo_name}/{file_path}`")
+
+# --- Pratinjau file link yang di-upload ---
+LINKS_PREVIEW_COUNT = 10 # Jumlah link yang ditampilkan di pratinjau
+LINKS_PREVIEW_MAX_CHARS = 120 # Link panjang (VMess base64) dipotong di pratinjau
+
+def show_links_file_preview(links_file):
+    """Tampilkan beberapa link pertama dari file upload saja, bukan seluruh isinya."""
+    # Pratinjau disimpan per file_id, jadi rerun nggak baca ulang file-nya
+    cached = st.session_state.get('links_file_preview')
+    if cached is None or cached[0] != links_file.file_id:
+        try:
+            links_file.seek(0)
+            preview = list(itertools.islice(singbox_converter.read_links_file(links_file), LINKS_PREVIEW_COUNT))
+        except Exception as e:
+            st.error(f"⚠️ File '{links_file.name}' nggak bisa dibaca: {e}")
+            return
+        cached = (links_file.file_id, preview)
+        st.session_state.links_file_preview = cached
+    preview = cached[1]
+    if not preview:
+        st.warning(f"⚠️ Nggak ada link di file '{links_file.name}'.")
+        return
+    lines = [link if len(link) <= LINKS_PREVIEW_MAX_CHARS else link[:LINKS_PREVIEW_MAX_CHARS] + "…" for link in preview]
+    st.caption(f"Pratinjau {len(preview)} link pertama dari '{links_file.name}' ({links_file.size:,} byte):")
+    st.code("\n".join(lines), language=None)
+
+# --- Ringkasan dan viewer config hasil konversi ---
+CONFIG_VIEWER_PAGE_SIZE = 50 # Outbound per halaman di viewer
+
+def show_config_summary(artifact):
+    """Ringkasan config (per protokol, region, ukuran selector, beberapa outbound pertama) dan viewer per halaman."""
+    summary = artifact.summary # Dihitung sekali per artifact, bukan tiap rerun
+    cols = st.columns(3)
+    cols[0].metric("Node hasil konversi", f"{summary['node_count']:,}")
+    cols[1].metric("Total outbound", f"{summary['outbound_count']:,}")
+    cols[2].metric("Ukuran config", f"{len(artifact.config_content) / 1024:,.0f} KB")
+
+    cols = st.columns(3)
+    with cols[0]:
+        st.caption("Per protokol")
+        st.dataframe([{"protokol": name, "jumlah": count} for name, count in summary["protocols"].items()],
+                     hide_index=True, use_container_width=True)
+    with cols[1]:
+        st.caption("Per region")
+        st.dataframe([{"region": name, "jumlah": count} for name, count in summary["regions"].items()],
+                     hide_index=True, use_container_width=True)
+    with cols[2]:
+        st.caption("Anggota selector/urltest")
+        st.dataframe([{"selector": name, "anggota": count} for name, count in summary["selectors"].items()],
+                     hide_index=True, use_container_width=True)
+
+    if summary["sample"]:
+        st.caption(f"{len(summary['sample'])} outbound hasil konversi pertama:")
+        st.code(json.dumps(summary["sample"], indent=2, ensure_ascii=False), language="json")
+
+    # Sisa outbound cuma di-render kalau user minta, satu halaman per rerun
+    if st.toggle("Lihat semua outbound per halaman", key="config_viewer_enabled"):
+        page_count = max(1, -(-summary["outbound_count"] // CONFIG_VIEWER_PAGE_SIZE))
+        page = st.number_input(f"Halaman (dari {page_count})", min_value=1, max_value=page_count, value=1,
+                               step=1, key="config_viewer_page")
+        outbounds, _ = get_artifact_store().outbound_page(artifact, page - 1, CONFIG_VIEWER_PAGE_SIZE)
+        st.code(json.dumps(outbounds, indent=2, ensure_ascii=False), language="json")
 
 # --- Fungsi untuk halaman Sing-Box Converter ---
 def singbox_converter_page():
@@ -292,6 +546,11 @@ def singbox_converter_page():
     st.write("Di sini lo bisa konversi link VPN dan atur config Sing-Box lo.")
 
     vpn_links = st.text_area("Masukkan link VPN (VMess/VLESS/Trojan):", height=200)
+    # Buat list link yang besar: file dibaca per baris di server, nggak lewat text area
+    links_file = st.file_uploader("Atau upload file link (teks biasa, base64 subscription, atau .gz):", key="links_file")
+    if links_file is not None:
+        show_links_file_preview(links_file)
+    subscription_urls = st.text_area("URL subscription (opsional, satu URL per baris):", height=100)
     singbox_template = load_template_from_file()
 
     if singbox_template is None:
@@ -299,146 +558,196 @@ def singbox_converter_page():
 
     # Tombol Konversi
     if st.button("🚀 Konversi Config"):
-        if not vpn_links:
-            st.error("⚠️ Link VPN nggak boleh kosong, tod!")
+        if not vpn_links and links_file is None and not subscription_urls.strip():
+            st.error("⚠️ Link VPN, file link, atau URL subscription nggak boleh kosong, tod!")
         elif singbox_template is None:
             st.error("⚠️ Template config tidak dapat dimuat karena file 'singbox-template.txt' tidak ditemukan.")
         else:
             try:
-                result = singbox_converter.process_singbox_config(vpn_links, singbox_template)
+                links_input = singbox_converter.LinkInput()
+                links_input.add_links(singbox_converter.iter_links(vpn_links))
+                if links_file is not None:
+                    # Link dari file setelah link manual. Job membaca file-nya per baris/chunk (hash, lalu konversi)
+                    # tanpa jadi list; BytesIO sendiri (buffer yang sama) supaya pratinjau di rerun nggak menggeser posisinya
+                    links_input.add_file(io.BytesIO(links_file.getvalue()))
+                if subscription_urls.strip():
+                    with st.spinner("Mengambil subscription..."):
+                        subscription_results = get_subscription_fetcher().fetch_all(subscription_urls.split('\n'))
+                    for subscription_result in subscription_results:
+                        if subscription_result["status"] == "error":
+                            st.warning(f"⚠️ {subscription_result['url']}: {subscription_result['message']}")
+                    # Link manual dulu, lalu link dari subscription sesuai urutan URL
+                    links_input.add_links(subscription_fetcher.iter_subscription_links(subscription_results))
+
+                # Konversi jalan di background (job runner), hasilnya disimpan sebagai artifact dengan key hash
+                # link + template. Rerun karena navigasi repo GitHub pakai artifact ini lagi, dan input yang sama
+                # dari session lain nggak dikonversi ulang.
+                job = get_job_runner().submit(conversion_owner(), links_input, singbox_template)
+                st.session_state.conversion_job_id = job.id
+            except conversion_jobs.JobLimitError as e:
+                st.warning(f"⏳ {e}")
+            except Exception as e:
+                st.error(f"Terjadi error saat memproses konversi: {e}")
+
+    if st.session_state.conversion_job_id:
+        conversion_progress()
+
+    # Pesan dari job yang baru selesai (gagal/dibatalkan) ditampilkan sekali
+    if st.session_state.conversion_notice:
+        level, message = st.session_state.conversion_notice
+        st.session_state.conversion_notice = None
+        getattr(st, level)(message)
+
+    # Hasil konversi terakhir tetap tampil di setiap rerun (klik breadcrumb, pilih folder, refresh repo)
+    artifact = st.session_state.conversion_artifact
+    if artifact is not None:
+        st.success("✅ Config berhasil dikonversi, mek!")
+        if artifact.duplicates_dropped:
+            st.info(f"♻️ {artifact.duplicates_dropped} node duplikat dibuang (server sama, nama beda).")
+        converted_config = artifact.config_content
+        # Config lengkap bisa bermega-byte, jadi yang ditampilkan cuma ringkasan + viewer per halaman
+        show_config_summary(artifact)
+        
+        # Versi terkompresi dibuat sekali per artifact lalu disimpan bareng artifact-nya
+        download_format = st.radio(
+            "Format download:", ["JSON"] + singbox_converter.available_compressions(),
+            horizontal=True, key="download_format"
+        )
+        if download_format == "JSON":
+            download_data, download_name, download_mime = converted_config, "converted_singbox_config.json", "application/json"
+        else:
+            download_data = artifact.compressed(download_format)
+            download_name = "converted_singbox_config.json" + singbox_converter.COMPRESSION_EXTENSIONS[download_format]
+            download_mime = singbox_converter.COMPRESSION_MIME_TYPES[download_format]
+            st.caption(f"{len(converted_config):,} → {len(download_data):,} byte "
+                       f"({len(converted_config) / max(len(download_data), 1):.1f}x lebih kecil)")
+
+        st.download_button(
+            label="⬇️ Download Config",
+            data=download_data,
+            file_name=download_name,
+            mime=download_mime,
+            key="download_button"
+        )
+        
+        # --- UI untuk Update ke GitHub ---
+        if st.session_state.logged_in and \
+           st.session_state.github_token and \
+           st.session_state.github_repo_name:
+            
+            st.markdown("---")
+            st.subheader("⬆️ Update Config ke GitHub")
+            st.info("Sekarang pilih atau masukkan path file config di repo lo.")
+            
+            current_repo_name = st.session_state.github_repo_name
+
+            # Tombol untuk refresh/list isi repo
+            if st.button("Refresh Isi Repo GitHub", key="refresh_repo_contents"):
+                # Head branch dicek ulang; tree cuma di-fetch lagi kalau memang ada commit baru
+                invalidate_repo_contents(st.session_state.github_token, current_repo_name)
+                st.session_state.refresh_repo = True
+                st.session_state.selected_github_dir = "" # Reset ke root saat refresh
+                st.session_state.selected_file_or_dir = "(Buat file baru di sini)" # Reset pilihan
+                st.rerun()
+            
+            # Hanya list jika ada token dan repo name
+            if st.session_state.github_token and st.session_state.github_repo_name:
+                # Tampilkan breadcrumb
+                st.markdown(f"**Lokasi saat ini:** `{current_repo_name}/{st.session_state.selected_github_dir}/`")
                 
-                if result["status"] == "success":
-                    st.success("✅ Config berhasil dikonversi, mek!")
-                    converted_config = result["config_content"]
-                    st.code(converted_config, language="json")
+                path_parts = [p for p in st.session_state.selected_github_dir.split('/') if p]
+                breadcrumb_paths = []
+                current_path_breadcrumb_display = ""
+                breadcrumb_paths.append(("Root", "")) # Opsi kembali ke root
+
+                for part in path_parts:
+                    current_path_breadcrumb_display = os.path.join(current_path_breadcrumb_display, part).replace("\\", "/")
+                    breadcrumb_paths.append((part, current_path_breadcrumb_display))
+
+                cols_breadcrumb = st.columns(len(breadcrumb_paths))
+                for i, (part_display, path_value) in enumerate(breadcrumb_paths):
+                    with cols_breadcrumb[i]:
+                        if st.button(part_display, key=f"breadcrumb_{i}"):
+                            st.session_state.selected_github_dir = path_value.strip('/')
+                            st.session_state.refresh_repo = True # Listing direktori ini diambil dari index lokal
+                            st.rerun()
+
+                # Cek apakah perlu refresh atau pertama kali
+                if st.session_state.get('refresh_repo', True):
+                    with st.spinner(f"Membaca isi repo '{current_repo_name}/{st.session_state.selected_github_dir}'..."):
+                        repo_contents_result = list_repo_contents(
+                            st.session_state.github_token,
+                            current_repo_name,
+                            st.session_state.selected_github_dir
+                        )
+                        st.session_state.repo_contents_result = repo_contents_result
+                    st.session_state.refresh_repo = False # Reset flag
+
+                if st.session_state.repo_contents_result and st.session_state.repo_contents_result["status"] == "success":
+                    contents = st.session_state.repo_contents_result["contents"]
+                    # Urutkan: direktori dulu, baru file, lalu urut abjad
+                    contents.sort(key=lambda x: (x['type'] != 'dir', x['name'].lower()))
+
+                    options = ["(Buat file baru di sini)"] # Opsi default
+                    for item in contents:
+                        if item['type'] == 'dir':
+                            options.append(f"📁 {item['name']}/")
+                        else:
+                            options.append(f"📄 {item['name']}")
                     
-                    st.download_button(
-                        label="⬇️ Download Config JSON",
-                        data=converted_config,
-                        file_name="converted_singbox_config.json",
-                        mime="application/json",
-                        key="download_button"
+                    # Simpan pilihan path terakhir
+                    # Pastikan pilihan sebelumnya masih ada di options, kalau tidak, reset ke default
+                    if st.session_state.selected_file_or_dir not in options:
+                        st.session_state.selected_file_or_dir = options[0]
+
+                    file_selection_idx = options.index(st.session_state.selected_file_or_dir)
+
+                    selected_option = st.selectbox(
+                        "Pilih file yang mau diupdate, atau pilih direktori:",
+                        options,
+                        index=file_selection_idx,
+                        key="github_file_or_dir_selector"
                     )
-                    
-                    # --- UI untuk Update ke GitHub ---
-                    if st.session_state.logged_in and \
-                       st.session_state.github_token and \
-                       st.session_state.github_repo_name:
-                        
-                        st.markdown("---")
-                        st.subheader("⬆️ Update Config ke GitHub")
-                        st.info("Sekarang pilih atau masukkan path file config di repo lo.")
-                        
-                        current_repo_name = st.session_state.github_repo_name
-
-                        # Tombol untuk refresh/list isi repo
-                        if st.button("Refresh Isi Repo GitHub", key="refresh_repo_contents"):
-                            st.session_state.refresh_repo = True
-                            st.session_state.selected_github_dir = "" # Reset ke root saat refresh
-                            st.session_state.selected_file_or_dir = "(Buat file baru di sini)" # Reset pilihan
-                            st.cache_data.clear() # Clear cache untuk konten repo
-                            st.rerun()
-                        
-                        # Hanya list jika ada token dan repo name
-                        if st.session_state.github_token and st.session_state.github_repo_name:
-                            # Tampilkan breadcrumb
-                            st.markdown(f"**Lokasi saat ini:** `{current_repo_name}/{st.session_state.selected_github_dir}/`")
-                            
-                            path_parts = [p for p in st.session_state.selected_github_dir.split('/') if p]
-                            breadcrumb_paths = []
-                            current_path_breadcrumb_display = ""
-                            breadcrumb_paths.append(("Root", "")) # Opsi kembali ke root
-
-                            for part in path_parts:
-                                current_path_breadcrumb_display = os.path.join(current_path_breadcrumb_display, part).replace("\\", "/")
-                                breadcrumb_paths.append((part, current_path_breadcrumb_display))
-
-                            cols_breadcrumb = st.columns(len(breadcrumb_paths))
-                            for i, (part_display, path_value) in enumerate(breadcrumb_paths):
-                                with cols_breadcrumb[i]:
-                                    if st.button(part_display, key=f"breadcrumb_{i}"):
-                                        st.session_state.selected_github_dir = path_value.strip('/')
-                                        st.session_state.refresh_repo = True # Force refresh
-                                        st.cache_data.clear() # Clear cache untuk konten repo
-                                        st.rerun()
-
-                            # Cek apakah perlu refresh atau pertama kali
-                            if st.session_state.get('refresh_repo', True):
-                                with st.spinner(f"Membaca isi repo '{current_repo_name}/{st.session_state.selected_github_dir}'..."):
-                                    repo_contents_result = list_repo_contents_cached( # Gunakan fungsi cached
-                                        st.session_state.github_token,
-                                        current_repo_name,
-                                        st.session_state.selected_github_dir
-                                    )
-                                    st.session_state.repo_contents_result = repo_contents_result
-                                st.session_state.refresh_repo = False # Reset flag
-
-                            if st.session_state.repo_contents_result and st.session_state.repo_contents_result["status"] == "success":
-                                contents = st.session_state.repo_contents_result["contents"]
-                                # Urutkan: direktori dulu, baru file, lalu urut abjad
-                                contents.sort(key=lambda x: (x['type'] != 'dir', x['name'].lower()))
-
-                                options = ["(Buat file baru di sini)"] # Opsi default
-                                for item in contents:
-                                    if item['type'] == 'dir':
-                                        options.append(f"📁 {item['name']}/")
-                                    else:
-                                        options.append(f"📄 {item['name']}")
-                                
-                                # Simpan pilihan path terakhir
-                                # Pastikan pilihan sebelumnya masih ada di options, kalau tidak, reset ke default
-                                if st.session_state.selected_file_or_dir not in options:
-                                    st.session_state.selected_file_or_dir = options[0]
-
-                                file_selection_idx = options.index(st.session_state.selected_file_or_dir)
-
-                                selected_option = st.selectbox(
-                                    "Pilih file yang mau diupdate, atau pilih direktori:",
-                                    options,
-                                    index=file_selection_idx,
-                                    key="github_file_or_dir_selector"
-                                )
-                                st.session_state.selected_file_or_dir = selected_option # Simpan pilihan
-
-                                github_target_file_path = ""
-                                if selected_option == "(Buat file baru di sini)":
-                                    # User akan memasukkan nama file baru
-                                    new_file_name = st.text_input("Nama file baru (contoh: config.json)", key="new_github_file_name_input")
-                                    if new_file_name: # Hanya buat path jika nama file tidak kosong
-                                        github_target_file_path = os.path.join(st.session_state.selected_github_dir, new_file_name).replace("\\", "/")
-                                    else:
-                                        st.warning("Masukkan nama file baru untuk disimpan.")
-                                else:
-                                    # Jika memilih file atau folder yang ada
-                                    if selected_option.startswith("📁 "):
-                                        folder_name = selected_option.replace("📁 ", "").strip('/')
-                                        st.session_state.selected_github_dir = os.path.join(st.session_state.selected_github_dir, folder_name).replace("\\", "/")
-                                        st.session_state.refresh_repo = True # Force refresh
-                                        st.cache_data.clear() # Clear cache untuk konten repo
-                                        st.rerun() # Rerun untuk masuk ke folder baru
-                                    else: # Ini adalah file yang dipilih
-                                        file_name = selected_option.replace("📄 ", "")
-                                        github_target_file_path = os.path.join(st.session_state.selected_github_dir, file_name).replace("\\", "/")
-
-                                if github_target_file_path: # Hanya tampilkan tombol jika path sudah valid
-                                    st.text_input("Path file yang akan diupdate:", value=github_target_file_path, disabled=True)
-                                    if st.button("⬆️ Update Config ke GitHub", key="github_update_button_final"):
-                                        update_config_to_github(
-                                            st.session_state.github_token,
-                                            current_repo_name,
-                                            github_target_file_path, # Gunakan path yang dipilih/dibuat
-                                            converted_config
-                                        )
-                            else:
-                                st.error(st.session_state.repo_contents_result["message"])
-                                st.info("Pastikan Personal Access Token dan Nama Repositori GitHub lo benar di halaman 'Login & Pengaturan Akun'.")
+                    st.session_state.selected_file_or_dir = selected_option # Simpan pilihan
+
+                    github_target_file_path = ""
+                    if selected_option == "(Buat file baru di sini)":
+                        # User akan memasukkan nama file baru
+                        new_file_name = st.text_input("Nama file baru (contoh: config.json)", key="new_github_file_name_input")
+                        if new_file_name: # Hanya buat path jika nama file tidak kosong
+                            github_target_file_path = os.path.join(st.session_state.selected_github_dir, new_file_name).replace("\\", "/")
                         else:
-                            st.info("Login dulu dan isi Personal Access Token serta Nama Repositori GitHub di halaman 'Login & Pengaturan Akun' untuk bisa update config ke GitHub, tod!")
-
+                            st.warning("Masukkan nama file baru untuk disimpan.")
+                    else:
+                        # Jika memilih file atau folder yang ada
+                        if selected_option.startswith("📁 "):
+                            folder_name = selected_option.replace("📁 ", "").strip('/')
+                            st.session_state.selected_github_dir = os.path.join(st.session_state.selected_github_dir, folder_name).replace("\\", "/")
+                            st.session_state.refresh_repo = True # Listing folder baru diambil dari index lokal
+                            st.rerun() # Rerun untuk masuk ke folder baru
+                        else: # Ini adalah file yang dipilih
+                            file_name = selected_option.replace("📄 ", "")
+                            github_target_file_path = os.path.join(st.session_state.selected_github_dir, file_name).replace("\\", "/")
+
+                    if github_target_file_path: # Hanya tampilkan tombol jika path sudah valid
+                        st.text_input("Path file yang akan diupdate:", value=github_target_file_path, disabled=True)
+                        publish_compressed = st.checkbox(
+                            "Upload juga versi terkompresi di sebelahnya (.gz, satu commit)",
+                            key="github_publish_compressed"
+                        )
+                        if st.button("⬆️ Update Config ke GitHub", key="github_update_button_final"):
+                            update_config_to_github(
+                                st.session_state.github_token,
+                                current_repo_name,
+                                github_target_file_path, # Gunakan path yang dipilih/dibuat
+                                converted_config,
+                                compressed_content=artifact.compressed("gzip") if publish_compressed else None
+                            )
                 else:
-                    st.error(f"❌ Gagal konversi: {result['message']}")
-            except Exception as e:
-                st.error(f"Terjadi error saat memproses konversi: {e}")
+                    st.error(st.session_state.repo_contents_result["message"])
+                    st.info("Pastikan Personal Access Token dan Nama Repositori GitHub lo benar di halaman 'Login & Pengaturan Akun'.")
+            else:
+                st.info("Login dulu dan isi Personal Access Token serta Nama Repositori GitHub di halaman 'Login & Pengaturan Akun' untuk bisa update config ke GitHub, tod!")
 
 # ... (sisa kode lainnya tetap sama) ...
 
@@ -479,7 +788,8 @@ def login_page():
             st.session_state.refresh_repo = True 
             st.session_state.selected_github_dir = "" # Reset ke root
             st.session_state.selected_file_or_dir = "(Buat file baru di sini)" # Reset pilihan file
-            st.cache_data.clear() # Clear cache untuk konten repo
+            # Nggak perlu clear cache global: settings user ini sudah di-invalidate oleh update_user_settings,
+            # dan index repo di-key per token/repo, jadi token/repo baru otomatis dapat entry baru
             # No rerun needed here, as inputs already update session state
             
         st.markdown("---")
@@ -489,14 +799,20 @@ def login_page():
             st.session_state.username = None
             st.session_state.page_selection = "🔐 Login & Pengaturan Akun" # Redirect ke login page
             st.success("Berhasil Logout.")
+            # Buang client dan index repo milik token user ini saja
+            if st.session_state.github_token:
+                invalidate_repo_contents_for_token(st.session_state.github_token)
             # Hapus juga info GitHub dari session_state saat logout
             st.session_state.github_token = ""
             st.session_state.github_repo_name = ""
             # st.session_state.github_file_path = "" # Dihapus
             st.session_state.selected_github_dir = "" # Reset dir selection
             st.session_state.selected_file_or_dir = "(Buat file baru di sini)" # Reset file selection
+            st.session_state.conversion_artifact = None # Hasil konversi user ini nggak ikut tampil setelah logout
+            if st.session_state.conversion_job_id:
+                get_job_runner().forget(st.session_state.conversion_job_id) # Job yang masih jalan dibatalkan
+                st.session_state.conversion_job_id = None
             st.session_state.refresh_repo = True # Ensure refresh on next access
-            st.cache_data.clear() # Clear cache for user-specific data
             st.rerun() # Muat ulang halaman untuk mencerminkan status logout
         return # Keluar dari fungsi agar tidak menampilkan form login/daftar lagi
 
@@ -513,9 +829,9 @@ def login_page():
                 st.session_state.username = username_login
                 
                 # Ambil pengaturan GitHub dari database setelah login sukses
-                user_settings = get_user_settings(username_login)
+                user_settings = load_user_settings(username_login)
                 if user_settings:
-                    st.session_state.github_token = decrypt_data(user_settings['github_token_encrypted'])
+                    st.session_state.github_token = user_settings['github_token']
                     st.session_state.github_repo_name = user_settings['github_repo_name']
                 
                 st.session_state.page_selection = "🏠 Homepage" # Redirect ke homepage setelah login
@@ -523,7 +839,7 @@ def login_page():
                 st.session_state.refresh_repo = True 
                 st.session_state.selected_github_dir = "" # Reset selected dir
                 st.session_state.selected_file_or_dir = "(Buat file baru di sini)" # Reset selected file
-                st.cache_data.clear() # Clear cache for user-specific data
+                # Nggak perlu clear cache: cache isi repo di-key per hash token, jadi user lain nggak kecampur
                 st.success(f"Login Berhasil! Selamat datang, {username_login}!")
                 st.rerun()
             else:
@@ -0,0 +1,209 @@
+"""
+Benchmark cold start dan rerun app.py.
+Jalankan: python bench_app_startup.py
+Bandingkan dengan versi app.py lain (misal commit sebelumnya):
+    git show HEAD~1:app.py > /tmp/app_lama.py
+    python bench_app_startup.py --baseline-app /tmp/app_lama.py
+
+Butuh streamlit (dipakai lewat streamlit.testing.v1.AppTest) plus passlib, cryptography dan
+PyGithub dari requirements.txt. MySQL diganti stand-in lokal di dalam proses yang mensimulasikan
+latency handshake TCP+TLS+auth, jadi bisa jalan offline tanpa server database. Tiap app diukur di proses Python baru supaya cold start-nya beneran cold.
+"""
+import argparse
+import importlib.abc
+import importlib.util
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import types
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+
+# Modul berat yang dicek apakah ikut ter-import saat render halaman login
+HEAVY_MODULES = ["mysql.connector", "github", "cryptography.fernet"]
+
+class MySQLStandIn:
+    """
+    Minimal in-process replacement for mysql.connector.
+    connect() sleeps `handshake_ms` to mimic the remote TCP+TLS+auth handshake and counts connections.
+    """
+
+    def __init__(self, handshake_ms):
+        self.handshake_ms = handshake_ms
+        self.connects = 0
+        self.queries = 0
+
+    def build_modules(self):
+        stand_in = self
+
+        class Error(Exception):
+            def __init__(self, msg="", errno=None):
+                super().__init__(msg)
+                self.errno = errno
+
+        class Cursor:
+            def __init__(self, dictionary=False):
+                self.dictionary = dictionary
+
+            def execute(self, query, params=None):
+                stand_in.queries += 1
+
+            def fetchone(self):
+                return None
+
+            def close(self):
+                pass
+
+        class Connection:
+            def __init__(self):
+                self.open = True
+
+            def cursor(self, dictionary=False, **kwargs):
+                return Cursor(dictionary)
+
+            def commit(self):
+                pass
+
+            def rollback(self):
+                pass
+
+            def is_connected(self):
+                return self.open
+
+            def ping(self, reconnect=False, attempts=1, delay=0):
+                if not self.open:
+                    raise Error("Connection closed")
+
+            def close(self):
+                self.open = False
+
+        def connect(**kwargs):
+            time.sleep(stand_in.handshake_ms / 1000)
+            stand_in.connects += 1
+            return Connection()
+
+        mysql = types.ModuleType("mysql")
+        connector = types.ModuleType("mysql.connector")
+        errorcode = types.ModuleType("mysql.connector.errorcode")
+        errorcode.ER_DUP_ENTRY = 1062
+        connector.connect = connect
+        connector.Error = Error
+        connector.errorcode = errorcode
+        mysql.connector = connector
+        return {"mysql": mysql, "mysql.connector": connector, "mysql.connector.errorcode": errorcode}
+
+class _StandInFinder(importlib.abc.MetaPathFinder, importlib.abc.Loader):
+    # Stand-in baru dimasukkan ke sys.modules saat app benar-benar meng-import mysql,
+    # jadi benchmark bisa lihat apakah import-nya lazy atau tidak
+    def __init__(self, modules):
+        self.modules = modules
+
+    def find_spec(self, fullname, path, target=None):
+        if fullname in self.modules:
+            return importlib.util.spec_from_loader(fullname, self, is_package=fullname != "mysql.connector.errorcode")
+        return None
+
+    def create_module(self, spec):
+        return self.modules[spec.name]
+
+    def exec_module(self, module):
+        pass
+
+def run_child(app_path, reruns, handshake_ms):
+    """Measures one app in this (fresh) process and returns the result dict."""
+    stand_in = MySQLStandIn(handshake_ms)
+    sys.meta_path.insert(0, _StandInFinder(stand_in.build_modules()))
+    # Direktori app harus ada di sys.path supaya singbox_converter dll bisa di-import
+    sys.path.insert(0, os.path.dirname(os.path.abspath(app_path)))
+
+    start = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+    streamlit_import = time.perf_counter() - start
+
+    app = AppTest.from_file(app_path, default_timeout=60)
+    app.secrets["encryption_key"] = "Zm9vYmFyYmF6cXV4Zm9vYmFyYmF6cXV4Zm9vYmFyYmE="
+    app.secrets["mysql"] = {"host": "127.0.0.1", "port": 3306, "user": "bench", "password": "bench", "database": "bench"}
+
+    start = time.perf_counter()
+    app.run()
+    cold = time.perf_counter() - start
+    cold_connects = stand_in.connects
+    imported = {name: name in sys.modules for name in HEAVY_MODULES}
+
+    rerun_times = []
+    rerun_connects = []
+    for _ in range(reruns):
+        connects_before = stand_in.connects
+        start = time.perf_counter()
+        app.run()
+        rerun_times.append(time.perf_counter() - start)
+        rerun_connects.append(stand_in.connects - connects_before)
+
+    return {
+        "app": app_path,
+        "handshake_ms": handshake_ms,
+        "streamlit_import_ms": round(streamlit_import * 1000, 3),
+        "cold_run_ms": round(cold * 1000, 3),
+        "cold_mysql_connects": cold_connects,
+        "rerun_ms_mean": round(statistics.mean(rerun_times) * 1000, 3) if rerun_times else None,
+        "rerun_ms_median": round(statistics.median(rerun_times) * 1000, 3) if rerun_times else None,
+        "rerun_mysql_connects_mean": statistics.mean(rerun_connects) if rerun_connects else None,
+        "heavy_modules_imported": imported,
+        "exceptions": [str(e.value) for e in app.exception],
+        # st.error di halaman (misal kredensial MySQL nggak kebaca) bikin angka di atas nggak mewakili halaman login
+        "errors": [str(e.value) for e in app.error],
+    }
+
+def measure_app(app_path, reruns, handshake_ms):
+    # Proses baru per app supaya import dan st.cache_resource mulai dari nol
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", app_path,
+         "--reruns", str(reruns), "--handshake-ms", str(handshake_ms)],
+        capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def print_result(label, result):
+    print(f"{label}: {result['app']}")
+    print(f"  cold run        {result['cold_run_ms']:9.1f} ms  ({result['cold_mysql_connects']} koneksi MySQL)")
+    print(f"  rerun (median)  {result['rerun_ms_median']:9.1f} ms  ({result['rerun_mysql_connects_mean']:.1f} koneksi MySQL per rerun)")
+    imported = [name for name, loaded in result["heavy_modules_imported"].items() if loaded]
+    print(f"  modul berat ter-import di halaman login: {', '.join(imported) or '-'}")
+    for exception in result["exceptions"]:
+        print(f"  exception: {exception}")
+    for error in result["errors"]:
+        print(f"  st.error: {error}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cold start dan rerun app.py.")
+    parser.add_argument("--app", default=APP_PATH, help="app.py yang diukur (default app.py di repo ini)")
+    parser.add_argument("--baseline-app", help="app.py pembanding, misal hasil git show HEAD~1:app.py")
+    parser.add_argument("--reruns", type=int, default=20, help="Jumlah rerun yang diukur (default 20)")
+    parser.add_argument("--handshake-ms", type=float, default=150, help="Simulasi latency handshake MySQL (default 150 ms)")
+    parser.add_argument("--output", help="Simpan hasil ke file JSON")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args.child, args.reruns, args.handshake_ms)))
+        return
+
+    results = {"current": measure_app(args.app, args.reruns, args.handshake_ms)}
+    if args.baseline_app:
+        results["baseline"] = measure_app(args.baseline_app, args.reruns, args.handshake_ms)
+
+    for label, result in results.items():
+        print_result(label, result)
+    if "baseline" in results and results["current"]["rerun_ms_median"]:
+        speedup = results["baseline"]["rerun_ms_median"] / results["current"]["rerun_ms_median"]
+        print(f"Rerun {speedup:.1f}x lebih cepat dari baseline.")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Hasil disimpan ke {args.output}")
+
+if __name__ == '__main__':
+    main()
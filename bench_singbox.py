@@ -0,0 +1,301 @@
+"""
+Benchmark untuk singbox_converter.
+Jalankan: python bench_singbox.py
+Semua input dibuat sintetis, jadi bisa jalan offline tanpa dependensi tambahan.
+
+Suite lengkap (10/1k/10k/100k link x beberapa template), hasilnya disimpan ke JSON:
+    python bench_singbox.py --suite --output bench_results.json
+Bandingkan dengan hasil commit sebelumnya:
+    python bench_singbox.py --suite --compare bench_results_lama.json
+"""
+import argparse
+import base64
+import io
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import time
+import tracemalloc
+
+import singbox_converter
+
+TEMPLATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "singbox-template.txt")
+
+COUNTRY_PREFIXES = ["US", "SG", "ID", "JP", "DE", "HK", ""]
+
+SUITE_SIZES = [10, 1000, 10000, 100000]
+# Nama template -> (jumlah selector tambahan, jumlah route rule tambahan)
+SUITE_TEMPLATES = {"default": (0, 0), "large": (20, 500), "xlarge": (100, 5000)}
+# xlarge x 100k link butuh beberapa GB memori, jadi hanya jalan kalau diminta lewat --templates
+SUITE_DEFAULT_TEMPLATES = ["default", "large"]
+
+def generate_links(count, seed=0):
+    """Generates `count` synthetic vmess/vless/trojan links with mixed ws/grpc/tcp transports and TLS options."""
+    rng = random.Random(seed)
+    links = []
+    for i in range(count):
+        country = rng.choice(COUNTRY_PREFIXES)
+        name = f"{country} - ISP{i % 50} [Bench]" if country else f"node_{i}"
+        transport = rng.choice(["ws", "grpc", "tcp"])
+        tls = rng.random() < 0.6
+        protocol = i % 3
+        if protocol == 0:
+            vmess = {
+                "v": "2", "ps": name, "add": f"s{i}.example.com", "port": "443" if tls else "80",
+                "id": f"uuid-{i}", "aid": "0", "scy": "auto", "net": transport,
+                "host": f"h{i}.example.com", "path": "/ws", "tls": "tls" if tls else "",
+            }
+            if tls and rng.random() < 0.5:
+                vmess["fp"] = "chrome"
+            if tls and rng.random() < 0.5:
+                vmess["alpn"] = "h2,http/1.1"
+            links.append("vmess://" + base64.b64encode(json.dumps(vmess).encode()).decode())
+            continue
+
+        query = [f"type={transport}"]
+        if tls:
+            query += ["security=tls", f"sni=sni{i}.example.com"]
+            if rng.random() < 0.5:
+                query.append("fp=chrome")
+            if rng.random() < 0.5:
+                query.append("alpn=h2%2Chttp%2F1.1")
+        if transport == "ws":
+            query += ["path=%2Fws", f"host=h{i}.example.com"]
+        elif transport == "grpc":
+            query.append("serviceName=grpc")
+        scheme = "vless" if protocol == 1 else "trojan"
+        links.append(f"{scheme}://uuid-{i}@srv{i}.example.org:443?{'&'.join(query)}#{name.replace(' ', '%20')}")
+    return links
+
+def measure(func):
+    """
+    Returns (result, seconds, peak traced memory in bytes) for func.
+    Time and memory come from separate runs, because tracemalloc slows allocations down.
+    """
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    del result
+    tracemalloc.start()
+    result = func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+def bench_serializers(link_count, template_content):
+    """Compares the legacy json.dumps(indent=2) output with the serializer backends and the streaming writer."""
+    links_str = "\n".join(generate_links(link_count))
+    result = singbox_converter.process_singbox_config(links_str, template_content)
+    config_data = json.loads(result["config_content"])
+
+    cases = {
+        "stdlib indent=2 (lama)": lambda: json.dumps(config_data, indent=2),
+        "pretty stdlib": lambda: singbox_converter.ConfigSerializer(backend="json").dumps(config_data),
+        "compact stdlib": lambda: singbox_converter.ConfigSerializer(compact=True, backend="json").dumps(config_data),
+    }
+    if singbox_converter.orjson is not None:
+        cases["pretty orjson"] = lambda: singbox_converter.ConfigSerializer(backend="orjson").dumps(config_data)
+        cases["compact orjson"] = lambda: singbox_converter.ConfigSerializer(compact=True, backend="orjson").dumps(config_data)
+
+    rows = []
+    for name, func in cases.items():
+        output, elapsed, peak = measure(func)
+        rows.append((f"dump: {name}", elapsed, peak, len(output)))
+
+    # Pipeline penuh: string di memori vs streaming ke file
+    for name, options in (("pretty", None), ("compact", {"compact": True})):
+        result, elapsed, peak = measure(
+            lambda: singbox_converter.process_singbox_config(links_str, template_content, output_options=options)
+        )
+        rows.append((f"process_singbox_config {name}", elapsed, peak, len(result["config_content"])))
+
+        def stream():
+            with open(os.devnull, "w", encoding="utf-8") as sink:
+                return singbox_converter.write_singbox_config(io.StringIO(links_str), template_content, sink, output_options=options)
+        _, elapsed, peak = measure(stream)
+        rows.append((f"write_singbox_config {name}", elapsed, peak, None))
+    return rows
+
+def bench_subscription_decode(line_count):
+    """Compares the per-link subscription decode path with the bulk decoder on one base64 blob."""
+    blob = base64.b64encode("\n".join(generate_links(line_count)).encode())
+
+    def per_link():
+        # Jalur lama: b64decode blob, pecah per baris, lalu decode tiap payload VMess satu per satu
+        links = list(singbox_converter.iter_links(base64.b64decode(blob).decode('utf-8')))
+        configs = []
+        for link in links:
+            if link.startswith("vmess://"):
+                payload = link[len("vmess://"):]
+                payload += "=" * (-len(payload) % 4)
+                configs.append(json.loads(base64.b64decode(payload).decode('utf-8')))
+        return links, configs
+
+    def bulk():
+        links = singbox_converter.decode_subscription(memoryview(blob))
+        decode_payload = singbox_converter._decode_vmess_payload
+        return links, [decode_payload(link[len("vmess://"):])[0] for link in links if link.startswith("vmess://")]
+
+    rows = []
+    for name, func in (("per-link", per_link), ("bulk", bulk)):
+        result, elapsed, peak = measure(func)
+        rows.append((f"decode {name}", elapsed, peak, len(result[0])))
+    return rows
+
+def generate_template(template_content, extra_selectors, extra_rules, seed=0):
+    """
+    Grows the base template with `extra_selectors` merge-style selectors (each keeping a
+    few valid and stale references) and `extra_rules` route rules, to mimic large templates.
+    """
+    if not extra_selectors and not extra_rules:
+        return template_content
+    rng = random.Random(seed)
+    config = json.loads(template_content)
+    outbounds = config["outbounds"]
+    for i in range(extra_selectors):
+        refs = ["direct", "Internet", f"stale-node-{i}"] + [f"Region {rng.randint(0, extra_selectors)}" for _ in range(3)]
+        outbounds.insert(len(outbounds) - 4, {"type": "selector", "tag": f"Region {i}", "outbounds": refs})
+    rules = config.setdefault("route", {}).setdefault("rules", [])
+    for i in range(extra_rules):
+        rules.append({"domain_suffix": [f"d{i}.example.net", f"e{i}.example.net"], "outbound": rng.choice(["direct", "block", "Internet"])})
+    return json.dumps(config, indent=2)
+
+def profile_phases(links_str, template_content):
+    """
+    Runs process_singbox_config with stats enabled.
+    Returns ({phase: seconds}, number of converted nodes).
+    """
+    result = singbox_converter.process_singbox_config(links_str, template_content, stats=True)
+    stages = result["stats"]["stages_ms"]
+    stages.pop("total", None)
+    return {name: ms / 1000 for name, ms in stages.items()}, result["stats"]["counters"]["converted"]
+
+def run_suite(sizes, template_names, template_content, repeat=1):
+    """Runs every (link count, template) pair and returns a list of result dicts."""
+    templates = {
+        name: generate_template(template_content, *SUITE_TEMPLATES[name])
+        for name in template_names
+    }
+    corpus = generate_links(max(sizes))
+    results = []
+    for size in sizes:
+        links_str = "\n".join(corpus[:size])
+        for name, content in templates.items():
+            # Ambil run tercepat dari `repeat` kali supaya noise berkurang
+            best_total, best_phases = None, None
+            for _ in range(repeat):
+                start = time.perf_counter()
+                result = singbox_converter.process_singbox_config(links_str, content)
+                total = time.perf_counter() - start
+                if result["status"] != "success":
+                    raise RuntimeError(result["message"])
+                if best_total is None or total < best_total:
+                    best_total = total
+            for _ in range(repeat):
+                phases, converted = profile_phases(links_str, content)
+                if best_phases is None or sum(phases.values()) < sum(best_phases.values()):
+                    best_phases = phases
+
+            tracemalloc.start()
+            singbox_converter.process_singbox_config(links_str, content)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+            results.append({
+                "links": size,
+                "template": name,
+                "converted": converted,
+                "total_ms": round(best_total * 1000, 3),
+                "links_per_sec": round(size / best_total, 1) if best_total else None,
+                "phases_ms": {phase: round(seconds * 1000, 3) for phase, seconds in best_phases.items()},
+                "peak_memory_mb": round(peak / 1e6, 3),
+                "output_bytes": len(result["config_content"].encode("utf-8")),
+            })
+    return results
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def suite_report(results):
+    """Wraps suite results with enough metadata to compare runs between commits."""
+    return {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "orjson": singbox_converter.orjson is not None,
+        "results": results,
+    }
+
+def print_suite(results, baseline=None):
+    """Prints suite results; with a baseline report, adds the change in total time per case."""
+    baseline_index = {}
+    if baseline:
+        baseline_index = {(r["links"], r["template"]): r for r in baseline["results"]}
+    phase_names = list(results[0]["phases_ms"]) if results else []
+    print(f"  {'links':>7} {'template':<8} {'total ms':>10} {'links/s':>10} {'peak MB':>9}  " + " ".join(f"{p:>16}" for p in phase_names))
+    for r in results:
+        line = f"  {r['links']:>7} {r['template']:<8} {r['total_ms']:>10.1f} {r['links_per_sec']:>10.0f} {r['peak_memory_mb']:>9.2f}  "
+        line += " ".join(f"{r['phases_ms'][p]:>16.1f}" for p in phase_names)
+        old = baseline_index.get((r["links"], r["template"]))
+        if old and old["total_ms"]:
+            line += f"  {(r['total_ms'] - old['total_ms']) / old['total_ms'] * 100:+6.1f}% vs {baseline.get('commit')}"
+        print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark singbox_converter.")
+    parser.add_argument("--links", type=int, default=20000, help="Jumlah link sintetis (default 20000)")
+    parser.add_argument("--subscription-lines", type=int, default=50000, help="Jumlah baris blob subscription (default 50000)")
+    parser.add_argument("--suite", action="store_true", help="Jalankan suite lengkap (ukuran x template)")
+    parser.add_argument("--sizes", default=",".join(map(str, SUITE_SIZES)), help="Jumlah link untuk suite, dipisah koma")
+    parser.add_argument("--templates", default=",".join(SUITE_DEFAULT_TEMPLATES),
+                        help=f"Template untuk suite, dipisah koma (pilihan: {', '.join(SUITE_TEMPLATES)})")
+    parser.add_argument("--repeat", type=int, default=3, help="Ulangi tiap kasus suite N kali, ambil yang tercepat")
+    parser.add_argument("--output", help="Simpan hasil suite ke file JSON")
+    parser.add_argument("--compare", help="File JSON hasil suite sebelumnya untuk dibandingkan")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    with open(TEMPLATE_PATH, "r") as f:
+        template_content = f.read()
+
+    if args.suite:
+        sizes = [int(size) for size in args.sizes.split(",") if size]
+        template_names = [name for name in args.templates.split(",") if name]
+        unknown = [name for name in template_names if name not in SUITE_TEMPLATES]
+        if unknown:
+            parser.error(f"Template tidak dikenal: {', '.join(unknown)}")
+        baseline = None
+        if args.compare:
+            with open(args.compare, "r", encoding="utf-8") as f:
+                baseline = json.load(f)
+
+        print(f"Suite benchmark, sizes {sizes}, templates {template_names}")
+        report = suite_report(run_suite(sizes, template_names, template_content, args.repeat))
+        print_suite(report["results"], baseline)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+            print(f"Hasil disimpan ke {args.output}")
+        return
+
+    print(f"Serializer benchmark, {args.links} links")
+    for name, elapsed, peak, size in bench_serializers(args.links, template_content):
+        size_text = f"{size / 1e6:8.2f} MB out" if size is not None else ""
+        print(f"  {name:<36} {elapsed * 1000:9.1f} ms  peak {peak / 1e6:8.2f} MB  {size_text}")
+
+    print(f"Subscription decode benchmark, {args.subscription_lines} lines")
+    for name, elapsed, peak, line_count in bench_subscription_decode(args.subscription_lines):
+        print(f"  {name:<36} {elapsed * 1000:9.1f} ms  peak {peak / 1e6:8.2f} MB  {line_count} links")
+
+if __name__ == '__main__':
+    main()
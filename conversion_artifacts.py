@@ -0,0 +1,132 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+
+import singbox_converter
+import ttl_cache
+
+logger = logging.getLogger(__name__)
+
+# Artifact disimpan selama sekian detik sejak dibuat
+DEFAULT_ARTIFACT_TTL = 3600
+# Config hasil konversi bisa puluhan MB, jadi jumlah artifact yang disimpan dibatasi kecil
+DEFAULT_MAX_ARTIFACTS = 32
+# Outbound hasil parse (buat viewer per halaman) jauh lebih besar dari teksnya, jadi cuma sedikit yang disimpan
+DEFAULT_MAX_PARSED = 4
+DEFAULT_PAGE_SIZE = 50
+# Hasil konversi yang gagal diingat sebentar, cukup supaya caller yang menunggu key yang sama dapat pesan aslinya
+FAILURE_TTL = 60
+
+def artifact_key(links, template_content, output_options=None):
+    """
+    Content address of a conversion: SHA-256 over the links (in order), the template
+    and the output options. Same inputs from any session give the same key. The links
+    are hashed as they are iterated, so a lazy input is never held as a list.
+    template_content may be the template JSON string or a CompiledTemplate.
+    """
+    template_hash = getattr(template_content, "content_hash", None) \
+        or hashlib.sha256(template_content.encode('utf-8')).hexdigest()
+    digest = hashlib.sha256()
+    digest.update(template_hash.encode('ascii'))
+    digest.update(json.dumps(output_options or {}, sort_keys=True).encode('utf-8'))
+    for link in links:
+        # Separator \0 nggak mungkin muncul di link, jadi batas antar link nggak ambigu
+        digest.update(b"\0")
+        digest.update(link.encode('utf-8'))
+    return digest.hexdigest()
+
+class ConversionArtifact:
+    """
+    Immutable result of one conversion, shared by every session that converts the same inputs.
+    Derived views (summary, compressed variants) are computed on first use and kept
+    with the artifact, so reruns and other sessions never redo them.
+    """
+
+    def __init__(self, key, config_content, link_count=0, duplicates_dropped=0):
+        self.key = key
+        self.config_content = config_content
+        self.link_count = link_count
+        self.duplicates_dropped = duplicates_dropped
+        self.created_at = time.time()
+        self._summary = None
+        self._compressed = {} # format kompresi -> bytes
+        self._lock = threading.Lock()
+
+    @property
+    def summary(self):
+        """singbox_converter.summarize_config() of the config, computed once."""
+        with self._lock:
+            if self._summary is None:
+                self._summary = singbox_converter.summarize_config(self.config_content)
+            return self._summary
+
+    def compressed(self, compression="gzip"):
+        """The config compressed with singbox_converter.compress_config(), computed once per format."""
+        with self._lock:
+            data = self._compressed.get(compression)
+            if data is None:
+                data = self._compressed[compression] = singbox_converter.compress_config(self.config_content, compression)
+                logger.info(f"Artifact {self.key[:12]} dikompres {compression}: {len(self.config_content):,} -> {len(data):,} byte.")
+            return data
+
+class ArtifactStore:
+    """
+    Bounded, process-wide store of ConversionArtifacts keyed by artifact_key().
+    get_or_convert() runs the conversion once per key, even when several sessions
+    submit the same inputs at the same time. Failed conversions are not stored as
+    artifacts; their result dict is only kept FAILURE_TTL seconds so every caller
+    that waited on the same key gets the real error.
+    """
+
+    def __init__(self, ttl=DEFAULT_ARTIFACT_TTL, max_entries=DEFAULT_MAX_ARTIFACTS, max_parsed=DEFAULT_MAX_PARSED):
+        self._cache = ttl_cache.TTLCache(ttl=ttl, max_entries=max_entries)
+        self._parsed = ttl_cache.TTLCache(ttl=ttl, max_entries=max_parsed) # key artifact -> list outbound
+        self._failures = ttl_cache.TTLCache(ttl=FAILURE_TTL, max_entries=max_entries) # key artifact -> result gagal
+
+    def get(self, key):
+        return self._cache.get(key)
+
+    def get_or_convert(self, links, template_content, convert, output_options=None, key=None):
+        """
+        Returns (artifact, error_result). `links` is a list of links or another
+        re-iterable input (singbox_converter.LinkInput); convert(links) must return a
+        process_singbox_config() result dict, with `link_count` when links has no len().
+        On failure artifact is None and error_result is that dict, also for callers
+        that waited on it.
+        If convert raises (e.g. the conversion was cancelled), the exception goes to
+        this caller only and a caller waiting on the same key converts it itself.
+        `key` is the artifact_key() of the inputs, when the caller already has it.
+        """
+        if key is None:
+            key = artifact_key(links, template_content, output_options)
+        def load():
+            result = convert(links)
+            if result["status"] != "success":
+                # Disimpan sebelum load selesai, jadi caller yang menunggu key ini sudah bisa membacanya
+                self._failures.put(key, result)
+                return None
+            link_count = result["link_count"] if "link_count" in result else len(links)
+            return ConversionArtifact(key, result["config_content"], link_count, result.get("duplicates_dropped", 0))
+
+        artifact = self._cache.get_or_load(key, load)
+        if artifact is None:
+            return None, self._failures.get(key) or {"status": "error", "message": "Konversi gagal."}
+        return artifact, None
+
+    def outbound_page(self, artifact, page, page_size=DEFAULT_PAGE_SIZE):
+        """
+        Returns (outbounds, page_count) for 0-based `page` of the artifact's outbounds.
+        The config is parsed on the first page request and kept for the few most
+        recently viewed artifacts only.
+        """
+        outbounds = self._parsed.get_or_load(
+            artifact.key, lambda: json.loads(artifact.config_content).get("outbounds", [])
+        )
+        page_count = max(1, -(-len(outbounds) // page_size))
+        page = min(max(page, 0), page_count - 1)
+        return outbounds[page * page_size:(page + 1) * page_size], page_count
+
+    def __len__(self):
+        return len(self._cache)
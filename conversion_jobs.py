@@ -0,0 +1,245 @@
+import concurrent.futures
+import itertools
+import logging
+import threading
+import time
+
+import conversion_artifacts
+import singbox_converter
+
+logger = logging.getLogger(__name__)
+
+# Jumlah konversi yang jalan bersamaan di satu proses (semua user)
+DEFAULT_MAX_WORKERS = 2
+# Jumlah job aktif (antri + jalan) maksimal per user
+DEFAULT_PER_USER_LIMIT = 1
+# Job yang sudah selesai dibuang setelah sekian detik kalau hasilnya nggak diambil
+DEFAULT_JOB_RETENTION = 600
+# Progress (jumlah link) diteruskan ke job paling sering tiap sekian detik
+PROGRESS_INTERVAL = 0.1
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+class JobLimitError(Exception):
+    """Raised when a user already has the maximum number of active conversion jobs."""
+
+class _Cancelled(Exception):
+    # Dilempar dari convert() supaya konversi yang dibatalkan nggak dianggap gagal oleh job lain yang menunggu
+    pass
+
+class _ProgressStats(singbox_converter.ConversionStats):
+    # Stats biasa, tapi stage yang sedang jalan dan jumlah link yang sudah di-parse diteruskan
+    # ke semua job yang menunggu konversi yang sama (watching() -> list job, fraction(processed) -> 0.0 - 1.0).
+    # Jumlah link diteruskan paling sering tiap PROGRESS_INTERVAL detik, pergantian stage selalu
+    def __init__(self, watching, fraction):
+        super().__init__()
+        self._watching = watching
+        self._fraction = fraction
+        self._processed = 0
+        self._published_at = 0.0
+
+    def _publish(self, stage=None):
+        self._published_at = time.monotonic()
+        fraction = self._fraction(self._processed)
+        for job in self._watching():
+            # Diisi dari hitungan stats ini sendiri, jadi job yang mengambil alih konversi yang dibatalkan mulai lagi dari nol
+            job.processed = self._processed
+            job.fraction = fraction
+            if stage is not None:
+                job.stage = stage
+
+    def stage(self, name):
+        if name != "total":
+            self._publish(name)
+        return super().stage(name)
+
+    def count(self, name, value=1):
+        super().count(name, value)
+        if name == "links_in":
+            self._processed += value
+            if time.monotonic() - self._published_at >= PROGRESS_INTERVAL:
+                self._publish()
+
+class ConversionJob:
+    """
+    One conversion submitted to a ConversionJobRunner. Progress fields (`processed`,
+    `total`, `fraction`, `stage`, `state`) are updated by the worker thread and can be
+    read at any time; `artifact` or `error` is set when the job finishes. `total` is
+    None when the link count isn't known up front (e.g. an uploaded file).
+    """
+
+    def __init__(self, job_id, owner, total):
+        self.id = job_id
+        self.owner = owner
+        self.total = total
+        self.processed = 0
+        self.fraction = 0.0 # Bagian input yang sudah di-parse
+        self.stage = QUEUED
+        self.state = QUEUED
+        self.artifact = None
+        self.error = None
+        self.finished_at = None
+        self._cancel = threading.Event()
+
+    @property
+    def active(self):
+        return self.state in (QUEUED, RUNNING)
+
+    @property
+    def progress(self):
+        """Fraction of the input parsed, 0.0 - 1.0."""
+        if self.state == DONE:
+            return 1.0
+        return min(self.fraction, 1.0)
+
+    def cancel(self):
+        """Asks the job to stop; it ends as CANCELLED and its result is discarded."""
+        self._cancel.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+class ConversionJobRunner:
+    """
+    Runs conversions in a bounded, process-wide thread pool so the Streamlit script
+    thread stays responsive. Each user may have at most `per_user_limit` active jobs,
+    so one heavy user can't occupy every worker. Results go through an ArtifactStore,
+    so identical inputs are converted once and a cancelled job stores nothing. Jobs
+    waiting on the same conversion all see its progress; if the job running it is
+    cancelled, one of the waiting jobs converts the inputs itself. With a process-wide
+    singbox_converter.OutboundCache as `cache`, a conversion only parses the links
+    that no earlier job has seen.
+    """
+
+    def __init__(self, artifact_store, max_workers=DEFAULT_MAX_WORKERS, per_user_limit=DEFAULT_PER_USER_LIMIT,
+                 retention=DEFAULT_JOB_RETENTION, cache=None):
+        self.artifact_store = artifact_store
+        self.cache = cache
+        self.per_user_limit = per_user_limit
+        self.retention = retention
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="conversion-job")
+        self._jobs = {} # id job -> ConversionJob
+        self._watchers = {} # artifact key -> list job yang menunggu konversi yang sama
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def submit(self, owner, links, template_content, **convert_options):
+        """
+        Queues a conversion of `links` for `owner` and returns its ConversionJob. `links`
+        is a list or a re-iterable singbox_converter.LinkInput; it is iterated twice
+        (artifact key, then conversion) and never copied into a list.
+        convert_options are passed to process_singbox_config. Raises JobLimitError
+        when the owner already has per_user_limit active jobs.
+        """
+        with self._lock:
+            self._prune_locked()
+            active = sum(1 for job in self._jobs.values() if job.owner == owner and job.active)
+            if active >= self.per_user_limit:
+                raise JobLimitError(f"Masih ada {active} konversi yang jalan, tunggu selesai atau batalkan dulu.")
+            job = ConversionJob(str(next(self._ids)), owner, len(links) if hasattr(links, "__len__") else None)
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job, links, template_content, convert_options)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def forget(self, job_id):
+        """Drops a job once its result has been taken (an active job is cancelled first)."""
+        with self._lock:
+            job = self._jobs.pop(job_id, None)
+        if job is not None:
+            job.cancel()
+
+    def _prune_locked(self):
+        now = time.monotonic()
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished_at is not None and now - job.finished_at > self.retention]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def _watching(self, key):
+        with self._lock:
+            return list(self._watchers.get(key, ()))
+
+    def _run(self, job, links, template_content, convert_options):
+        if job.cancelled:
+            self._finish(job, CANCELLED)
+            return
+        job.state = RUNNING
+        output_options = convert_options.get("output_options")
+
+        def cancellable_links():
+            # Input berhenti mengalir begitu job dibatalkan, jadi konversi cepat selesai
+            for link in links:
+                if job.cancelled:
+                    return
+                yield link
+
+        def input_fraction(processed):
+            if job.total is not None:
+                return processed / job.total if job.total else 0.0
+            # Jumlah link belum diketahui (file upload): diukur dari bagian input yang sudah dibaca
+            return links.position / links.size if links.size else 0.0
+
+        def convert(links_to_convert):
+            stats = _ProgressStats(lambda: self._watching(key), input_fraction)
+            result = singbox_converter.process_singbox_config(
+                cancellable_links(), template_content, stats=stats, **{"cache": self.cache, **convert_options}
+            )
+            if job.cancelled:
+                # Hasil parsial jangan sampai masuk artifact store, dan job lain yang menunggu konversi sendiri
+                raise _Cancelled()
+            result["link_count"] = stats.counters["links_in"]
+            return result
+
+        key = None
+        try:
+            key = conversion_artifacts.artifact_key(links, template_content, output_options)
+            with self._lock:
+                self._watchers.setdefault(key, []).append(job)
+            artifact, error_result = self.artifact_store.get_or_convert(
+                links, template_content, convert, output_options, key=key
+            )
+        except _Cancelled:
+            self._finish(job, CANCELLED)
+            return
+        except Exception as e:
+            logger.error(f"Job konversi {job.id} gagal: {e}", exc_info=True)
+            job.error = f"Terjadi error saat memproses konversi: {e}"
+            self._finish(job, FAILED)
+            return
+        finally:
+            with self._lock:
+                watchers = self._watchers.get(key)
+                if watchers is not None:
+                    watchers.remove(job)
+                    if not watchers:
+                        del self._watchers[key]
+        if job.cancelled:
+            self._finish(job, CANCELLED)
+        elif artifact is None:
+            job.error = error_result["message"]
+            self._finish(job, FAILED)
+        else:
+            job.artifact = artifact
+            self._finish(job, DONE)
+
+    def _finish(self, job, state):
+        job.state = state
+        job.stage = state
+        job.finished_at = time.monotonic()
+        logger.info(f"Job konversi {job.id} ({job.owner}) selesai: {state}, {job.processed}/{job.total} link.")
+
+    def shutdown(self):
+        with self._lock:
+            jobs = list(self._jobs.values())
+        for job in jobs:
+            job.cancel()
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,257 @@
+import base64
+import collections
+import hashlib
+import logging
+import posixpath
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BRANCH = "main"
+# Head branch dicek ulang paling cepat tiap sekian detik (kecuali dipaksa refresh)
+DEFAULT_HEAD_CHECK_INTERVAL = 300
+# Jumlah maksimal (token, repo) yang handle + index-nya disimpan
+DEFAULT_MAX_REPOS = 64
+# Berapa kali publish_files mengulang kalau head branch keburu maju saat commit dibuat
+DEFAULT_PUBLISH_RETRIES = 3
+
+def make_github(token, base_url=None):
+    """Builds a PyGithub client; base_url points it at GitHub Enterprise or a local fake API."""
+    from github import Github
+    if base_url:
+        return Github(token, base_url=base_url)
+    return Github(token)
+
+def git_blob_sha(content):
+    """Git blob SHA-1 of `content` (str is encoded as UTF-8), same as the `sha` GitHub returns for a file."""
+    data = content.encode('utf-8') if isinstance(content, str) else bytes(content)
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+def upload_file(repo, path, content, message, branch=DEFAULT_BRANCH, create_message=None):
+    """
+    Writes one file to `branch`, skipping the commit when the content is already there.
+    The blob SHA from get_contents is compared with git_blob_sha(content), so a
+    byte-identical regeneration costs one read and no write.
+    Returns {"status": "success", "action": "unchanged"/"updated"/"created", "sha": <blob sha>};
+    API errors other than a missing file are raised.
+    """
+    sha = git_blob_sha(content)
+    try:
+        existing = repo.get_contents(path, ref=branch)
+    except Exception as e:
+        if getattr(e, "status", None) != 404:
+            raise
+        existing = None
+    if isinstance(existing, list):
+        raise IsADirectoryError(f"'{path}' adalah direktori di {repo.full_name}, bukan file.")
+
+    if existing is None:
+        repo.create_file(path, create_message or message, content, branch=branch)
+        action = "created"
+    elif existing.sha == sha:
+        logger.info(f"{repo.full_name}/{path} sudah sama persis, upload dilewati.")
+        action = "unchanged"
+    else:
+        repo.update_file(existing.path, message, content, existing.sha, branch=branch)
+        action = "updated"
+    return {"status": "success", "action": action, "sha": sha}
+
+def publish_files(repo, files, message, branch=DEFAULT_BRANCH, retries=DEFAULT_PUBLISH_RETRIES):
+    """
+    Commits several files to `branch` atomically with the Git Data API: one tree built
+    on the current head, one commit, one fast-forward ref update, whatever the number
+    of files. Files whose blob SHA already matches the head are left out, and nothing
+    is committed if none changed. Text content goes inline in the tree request; bytes
+    are uploaded as blobs first. If the branch moves before the ref update, the commit
+    is rebuilt on the new head (up to `retries` times).
+    `files` maps path -> str/bytes. Needs no UI, so scheduled jobs can call it directly.
+    Returns {"status": "success", "action": "committed"/"unchanged", "commit_sha", "changed", "unchanged"}.
+    """
+    from github import GithubException, InputGitTreeElement
+
+    files = {path.strip('/'): content for path, content in files.items()}
+    for attempt in range(retries + 1):
+        ref = repo.get_git_ref(f"heads/{branch}")
+        head = repo.get_git_commit(ref.object.sha)
+        existing = {
+            element.path: element.sha
+            for element in repo.get_git_tree(head.tree.sha, recursive=True).tree
+            if element.type == "blob"
+        }
+        # Tree terpotong cuma bikin file yang sama ikut di-commit ulang, bukan hilang
+        changed = [path for path, content in files.items() if existing.get(path) != git_blob_sha(content)]
+        unchanged = [path for path in files if path not in changed]
+        if not changed:
+            logger.info(f"Semua {len(files)} file di {repo.full_name}@{branch} sudah sama persis, nggak ada commit.")
+            return {"status": "success", "action": "unchanged", "commit_sha": head.sha, "changed": [], "unchanged": unchanged}
+
+        elements = []
+        for path in changed:
+            content = files[path]
+            if isinstance(content, str):
+                elements.append(InputGitTreeElement(path, "100644", "blob", content=content))
+            else:
+                blob = repo.create_git_blob(base64.b64encode(content).decode('ascii'), "base64")
+                elements.append(InputGitTreeElement(path, "100644", "blob", sha=blob.sha))
+        tree = repo.create_git_tree(elements, base_tree=head.tree)
+        commit = repo.create_git_commit(message, tree, [head])
+        try:
+            ref.edit(commit.sha, force=False)
+        except GithubException as e:
+            # 422 = bukan fast-forward, ada commit lain yang masuk duluan
+            if e.status != 422 or attempt == retries:
+                raise
+            logger.info(f"Head {repo.full_name}@{branch} berubah saat publish, diulang ({attempt + 1}/{retries}).")
+            continue
+        logger.info(f"{len(changed)} file di-commit ke {repo.full_name}@{branch} ({commit.sha[:7]}), {len(unchanged)} sama persis.")
+        return {"status": "success", "action": "committed", "commit_sha": commit.sha, "changed": changed, "unchanged": unchanged}
+
+class RepoTreeIndex:
+    """
+    In-memory index of a whole branch, built from one recursive tree request.
+    Directory listings are served from a path -> children map without API calls.
+    ensure_fresh() checks the branch head (one call, at most every `check_interval`
+    seconds) and only re-fetches the tree when the head SHA changed.
+    """
+
+    def __init__(self, repo, branch=DEFAULT_BRANCH, check_interval=DEFAULT_HEAD_CHECK_INTERVAL, clock=time.monotonic):
+        self.repo = repo
+        self.branch = branch
+        self.check_interval = check_interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._children = None # path direktori -> list {'name', 'path', 'type'}
+        self._blob_shas = {} # path file -> SHA blob
+        self._checked_at = None
+        self.head_sha = None
+        self.truncated = False
+        self.tree_fetches = 0
+
+    def mark_stale(self):
+        """Forces a head check on the next ensure_fresh() (e.g. after pushing to the branch)."""
+        with self._lock:
+            self._checked_at = None
+
+    def ensure_fresh(self, force=False):
+        """Makes sure the index matches the branch head. Returns True if the tree was (re)loaded."""
+        with self._lock:
+            now = self._clock()
+            if not force and self._children is not None and self._checked_at is not None \
+                    and now - self._checked_at < self.check_interval:
+                return False
+            branch = self.repo.get_branch(self.branch)
+            head_sha = branch.commit.sha
+            self._checked_at = now
+            if self._children is not None and head_sha == self.head_sha:
+                return False
+            # Payload branch sudah berisi SHA tree commit head, jadi nggak perlu request commit terpisah
+            self._load_tree(branch.commit.commit.tree.sha)
+            self.head_sha = head_sha
+            return True
+
+    def _load_tree(self, tree_sha):
+        tree = self.repo.get_git_tree(tree_sha, recursive=True)
+        self.tree_fetches += 1
+        children = collections.defaultdict(list)
+        children[""] = []
+        blob_shas = {}
+        for element in tree.tree:
+            # Submodule (commit) dan symlink dilewati, sama seperti listing get_contents sebelumnya
+            if element.type == "tree":
+                item_type = "dir"
+                children[element.path] # Direktori kosong tetap punya entry
+            elif element.type == "blob" and element.mode != "120000":
+                item_type = "file"
+                blob_shas[element.path] = element.sha
+            else:
+                continue
+            children[posixpath.dirname(element.path)].append(
+                {'name': posixpath.basename(element.path), 'path': element.path, 'type': item_type}
+            )
+        self.truncated = bool(tree.truncated)
+        if self.truncated:
+            logger.warning(f"Tree {self.repo.full_name}@{self.branch} terpotong oleh GitHub; sebagian path mungkin tidak muncul.")
+        self._children = dict(children)
+        self._blob_shas = blob_shas
+        logger.info(f"Index repo {self.repo.full_name}@{self.branch} dimuat: {len(blob_shas)} file, {len(self._children)} direktori.")
+
+    def children(self, path=""):
+        """Returns a copy of the entries in directory `path`, or None if it doesn't exist."""
+        with self._lock:
+            if self._children is None:
+                return None
+            entries = self._children.get(path.strip('/'))
+            return list(entries) if entries is not None else None
+
+    def blob_sha(self, path):
+        """Returns the blob SHA of file `path` at the indexed head, or None."""
+        with self._lock:
+            return self._blob_shas.get(path.strip('/'))
+
+class RepoHandleCache:
+    """
+    Keeps one PyGithub client per token and one repo handle plus RepoTreeIndex per
+    (token, repo, branch), so repeated calls skip `Github(token)` and `get_repo`.
+    Keys use a hash of the token. Bounded LRU; forget_token() drops one user's entries.
+    """
+
+    def __init__(self, base_url=None, max_repos=DEFAULT_MAX_REPOS, check_interval=DEFAULT_HEAD_CHECK_INTERVAL):
+        self.base_url = base_url
+        self.max_repos = max_repos
+        self.check_interval = check_interval
+        self._clients = {} # hash token -> Github
+        self._repos = collections.OrderedDict() # (hash token, repo, branch) -> (repo, RepoTreeIndex)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def token_hash(token):
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+    def _entry(self, token, repo_name, branch):
+        token_hash = self.token_hash(token)
+        key = (token_hash, repo_name, branch)
+        with self._lock:
+            entry = self._repos.get(key)
+            if entry is not None:
+                self._repos.move_to_end(key)
+                return entry
+            client = self._clients.get(token_hash)
+        if client is None:
+            client = make_github(token, self.base_url)
+        repo = client.get_repo(repo_name) # Gagal (repo nggak ada / token salah) -> exception, nggak disimpan
+        entry = (repo, RepoTreeIndex(repo, branch, self.check_interval))
+        with self._lock:
+            self._clients.setdefault(token_hash, client)
+            entry = self._repos.setdefault(key, entry)
+            while len(self._repos) > self.max_repos:
+                self._repos.popitem(last=False)
+            live_tokens = {cached_key[0] for cached_key in self._repos}
+            for cached_token_hash in [t for t in self._clients if t not in live_tokens]:
+                del self._clients[cached_token_hash]
+        return entry
+
+    def get_repo(self, token, repo_name, branch=DEFAULT_BRANCH):
+        return self._entry(token, repo_name, branch)[0]
+
+    def get_index(self, token, repo_name, branch=DEFAULT_BRANCH):
+        return self._entry(token, repo_name, branch)[1]
+
+    def mark_stale(self, token, repo_name, branch=DEFAULT_BRANCH):
+        """Marks a cached index stale without touching the API. Returns False if nothing is cached."""
+        with self._lock:
+            entry = self._repos.get((self.token_hash(token), repo_name, branch))
+        if entry is None:
+            return False
+        entry[1].mark_stale()
+        return True
+
+    def forget_token(self, token):
+        """Drops the client, repo handles and indexes of one token. Returns the number of repos dropped."""
+        token_hash = self.token_hash(token)
+        with self._lock:
+            keys = [key for key in self._repos if key[0] == token_hash]
+            for key in keys:
+                del self._repos[key]
+            self._clients.pop(token_hash, None)
+            return len(keys)
@@ -0,0 +1,162 @@
+import collections
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_SIZE = 5
+# Koneksi idle lebih lama dari ini ditutup (detik)
+DEFAULT_IDLE_TIMEOUT = 300
+# Koneksi idle lebih lama dari ini di-ping dulu sebelum dipinjamkan (detik)
+DEFAULT_HEALTH_CHECK_AFTER = 30
+# Lama menunggu koneksi kosong kalau pool sudah penuh (detik)
+DEFAULT_ACQUIRE_TIMEOUT = 10
+
+class PoolTimeoutError(Exception):
+    """Raised when no connection becomes available within the acquire timeout."""
+
+class PooledConnection:
+    """
+    Borrowed connection. Behaves like the underlying connection, but close() returns
+    it to the pool instead of closing it (same as mysql.connector's pooled connections).
+    """
+
+    def __init__(self, pool, connection):
+        self._pool = pool
+        self._connection = connection
+
+    def __getattr__(self, name):
+        if self._connection is None:
+            raise AttributeError(f"Koneksi sudah dikembalikan ke pool: {name}")
+        return getattr(self._connection, name)
+
+    def close(self):
+        if self._connection is not None:
+            connection, self._connection = self._connection, None
+            self._pool.release(connection)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+class MySQLConnectionPool:
+    """
+    Thread-safe, bounded pool of MySQL connections created by `connect()`.
+    At most `max_size` connections exist at once (borrowed + idle). Idle connections
+    older than `idle_timeout` are closed, and ones idle longer than `health_check_after`
+    are pinged before being handed out, so a connection dropped by the server is
+    replaced instead of failing the caller.
+    """
+
+    def __init__(self, connect, max_size=DEFAULT_MAX_SIZE, idle_timeout=DEFAULT_IDLE_TIMEOUT,
+                 health_check_after=DEFAULT_HEALTH_CHECK_AFTER, acquire_timeout=DEFAULT_ACQUIRE_TIMEOUT):
+        self._connect = connect
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check_after = health_check_after
+        self.acquire_timeout = acquire_timeout
+        # Idle connections as (connection, returned_at), most recently returned at the right
+        self._idle = collections.deque()
+        self._size = 0
+        self._condition = threading.Condition()
+        self._closed = False
+        self.created = 0
+        self.reused = 0
+
+    def acquire(self):
+        """Borrows a connection; call close() on it (or use `with`) to give it back."""
+        deadline = time.monotonic() + self.acquire_timeout
+        while True:
+            with self._condition:
+                self._evict_idle_locked()
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeoutError(f"Nggak ada koneksi MySQL kosong dalam {self.acquire_timeout} detik.")
+                    self._condition.wait(remaining)
+                    self._evict_idle_locked()
+                if self._idle:
+                    connection, returned_at = self._idle.pop()
+                else:
+                    connection, returned_at = None, None
+                self._size += 1 # Slot dipesan dulu, koneksi baru dibuat di luar lock
+
+            if connection is not None:
+                if time.monotonic() - returned_at < self.health_check_after or self._is_healthy(connection):
+                    self.reused += 1
+                    return PooledConnection(self, connection)
+                logger.info("Koneksi MySQL idle sudah mati, diganti koneksi baru.")
+                self._discard(connection)
+                continue
+
+            try:
+                connection = self._connect()
+            except Exception:
+                self._release_slot()
+                raise
+            self.created += 1
+            return PooledConnection(self, connection)
+
+    def release(self, connection):
+        """
+        Returns a borrowed connection. Unread results are consumed and an open
+        transaction is rolled back first, so the next borrower gets a clean session
+        (and no stale REPEATABLE READ snapshot).
+        """
+        try:
+            if getattr(connection, "unread_result", False):
+                connection.consume_results()
+            if getattr(connection, "in_transaction", False):
+                connection.rollback()
+        except Exception as e:
+            logger.warning(f"Rollback koneksi MySQL gagal, koneksi dibuang: {e}")
+            self._discard(connection)
+            return
+        with self._condition:
+            if not self._closed:
+                self._idle.append((connection, time.monotonic()))
+                self._size -= 1
+                self._condition.notify()
+                return
+        self._discard(connection)
+
+    def close(self):
+        """Closes all idle connections. Borrowed ones are closed when they are returned."""
+        with self._condition:
+            self._closed = True
+            idle = [connection for connection, _ in self._idle]
+            self._idle.clear()
+        for connection in idle:
+            self._close_quietly(connection)
+
+    def _is_healthy(self, connection):
+        try:
+            connection.ping(reconnect=False, attempts=1, delay=0)
+            return True
+        except Exception:
+            return False
+
+    def _evict_idle_locked(self):
+        # Yang paling lama idle ada di kiri deque
+        now = time.monotonic()
+        while self._idle and now - self._idle[0][1] > self.idle_timeout:
+            connection, _ = self._idle.popleft()
+            self._close_quietly(connection)
+
+    def _discard(self, connection):
+        self._close_quietly(connection)
+        self._release_slot()
+
+    def _release_slot(self):
+        with self._condition:
+            self._size -= 1
+            self._condition.notify()
+
+    def _close_quietly(self, connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
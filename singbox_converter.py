@@ -2,9 +2,32 @@ import json
 import os
 import urllib.parse
 import base64
+import binascii
+import gzip
 import re
 import logging
 import sys
+import shutil
+import tempfile
+import itertools
+import collections
+import concurrent.futures
+import contextlib
+import functools
+import hashlib
+import sqlite3
+import threading
+import time
+
+try:
+    import orjson # Opsional: backend JSON yang lebih cepat
+except ImportError:
+    orjson = None
+
+try:
+    import zstandard # Opsional: kompresi zstd untuk output config
+except ImportError:
+    zstandard = None
 
 logger = logging.getLogger(__name__)
 
@@ -17,6 +40,26 @@ EXCLUDED_SELECTOR_TAGS = [
     "Option P0rn"
 ]
 
+# Batas ukuran spool (byte) sebelum outbound hasil konversi dipindah ke file sementara di disk
+STREAM_SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+# Konversi paralel: jumlah link per chunk yang dikirim ke worker, dan minimal jumlah link
+# sebelum process pool dipakai (di bawah itu lebih cepat serial)
+PARALLEL_CHUNK_SIZE = 500
+PARALLEL_MIN_LINKS = 2000
+
+# Jumlah link yang diproses per chunk (lookup cache, parse, tag, dedup)
+LINK_BATCH_SIZE = 1000
+# Byte yang dibaca per chunk saat blob base64 subscription dari file di-decode
+SUBSCRIPTION_CHUNK_SIZE = 1024 * 1024
+
+# Jumlah maksimal link hasil parsing yang disimpan OutboundCache (LRU)
+OUTBOUND_CACHE_MAX_ENTRIES = 200000
+# Naikkan setiap kali parser link atau format tag berubah: cache di disk dengan versi lain dibuang
+CACHE_FORMAT_VERSION = 2
+# Entry baru/terpakai di OutboundCache ditulis ke disk begitu jumlahnya sampai sekian
+CACHE_FLUSH_THRESHOLD = 10000
+
 # Mapping kode negara ke simbol bendera Unicode
 COUNTRY_EMOJIS = {
     "US": "🇺🇸", "SG": "🇸🇬", "ID": "🇮🇩", "JP": "🇯🇵", "DE": "🇩🇪",
@@ -30,394 +73,1670 @@ def get_emoji_from_country_code(code):
     # Mengembalikan emoji negara atau globe berwarna jika kode tidak ditemukan
     return COUNTRY_EMOJIS.get(code.upper(), "🌎")
 
+# Hasil parsing satu link. Kalau gagal, outbound None dan error berisi alasan singkatnya.
+ParsedLink = collections.namedtuple("ParsedLink", ["outbound", "original_tag_name", "error"])
+
+_COUNTRY_PREFIX_RE = re.compile(r'^([A-Za-z]{2})\s*-\s*(.*)')
+_BRACKET_RE = re.compile(r'\s*\[.*?\]\s*')
+# Karakter yang dibuang urllib.parse.urlsplit dari URL sebelum parsing
+_URL_UNSAFE_CHARS = str.maketrans("", "", "\t\r\n")
+
+class LinkError(str):
+    """
+    Why a link could not be converted. Used as the human-readable message everywhere;
+    `reason` is a short stable code (e.g. "invalid_server_port") for stats and metrics labels.
+    """
+
+    def __new__(cls, message, reason):
+        error = super().__new__(cls, message)
+        error.reason = reason
+        return error
+
+    def __reduce__(self):
+        # Ikut terkirim utuh dari worker process pool
+        return (LinkError, (str(self), self.reason))
+
+def _link_error(message, reason):
+    return ParsedLink(None, None, LinkError(message, reason))
+
+# Alfabet base64 URL-safe ke standar, untuk str (payload VMess) dan bytes (blob subscription)
+_B64_URLSAFE_TO_STD = str.maketrans("-_", "+/")
+_B64_URLSAFE_TO_STD_BYTES = bytes.maketrans(b"-_", b"+/")
+# Byte di luar alfabet base64 (whitespace, '=', sampah) dibuang sebelum decode per chunk
+_B64_NON_ALPHABET = bytes(set(range(256)) - set(b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/-_"))
+# scan_once milik decoder C json: parse satu nilai JSON tanpa overhead wrapper json.loads
+_JSON_SCAN_ONCE = json.JSONDecoder().scan_once
+
+def _loads_json(text):
+    try:
+        value, end = _JSON_SCAN_ONCE(text, 0)
+        if end == len(text):
+            return value
+    except StopIteration:
+        pass
+    # Ada whitespace di awal/akhir atau JSON tidak valid: biar json.loads yang menangani/melempar error
+    return json.loads(text)
+
+def _decode_vmess_payload(encoded_data):
+    """
+    Decodes the base64 JSON body of a VMess link (the part after "vmess://").
+    Standard and URL-safe alphabets are accepted, padding is optional.
+    Returns (config, error); config is None when decoding fails.
+    """
+    if '-' in encoded_data or '_' in encoded_data:
+        encoded_data = encoded_data.translate(_B64_URLSAFE_TO_STD)
+    # Base64 decode with padding correction
+    missing_padding = len(encoded_data) % 4
+    if missing_padding:
+        encoded_data += '=' * (4 - missing_padding)
+    try:
+        decoded_data = binascii.a2b_base64(encoded_data).decode('utf-8')
+    except (ValueError, UnicodeDecodeError) as e:
+        return None, LinkError(f"invalid base64: {e}", "invalid_base64")
+    try:
+        config = _loads_json(decoded_data)
+    except (ValueError, RecursionError) as e:
+        return None, LinkError(f"invalid JSON: {e}", "invalid_json")
+    if not isinstance(config, dict):
+        return None, LinkError("VMess payload is not a JSON object", "invalid_json")
+    return config, None
+
 def parse_vmess_link(vmess_link):
     """
     Parses a VMess link (assuming base64 encoded JSON config).
     Returns a dictionary of VMess config, or None if parsing fails.
     """
+    if not vmess_link or not vmess_link.startswith("vmess://"):
+        logger.debug("VMess link invalid format or empty: %s...", vmess_link[:50])
+        return None
+
+    config, error = _decode_vmess_payload(vmess_link[len("vmess://"):])
+    if config is None:
+        logger.error(f"Error parsing VMess link (base64/JSON issue) for {vmess_link[:50]}...: {error}")
+        return None
+    logger.debug("Successfully parsed VMess link: %s", config.get('ps', 'NoName'))
+    return config
+
+def _to_int(value):
+    # int() yang mengembalikan None alih-alih melempar exception
     try:
-        if not vmess_link or not vmess_link.startswith("vmess://"):
-            logger.debug(f"VMess link invalid format or empty: {vmess_link[:50]}...")
-            return None
-        
-        encoded_data = vmess_link[len("vmess://"):]
-        # Base64 decode with padding correction
-        missing_padding = len(encoded_data) % 4
-        if missing_padding:
-            encoded_data += '=' * (4 - missing_padding)
-
-        decoded_data = base64.b64decode(encoded_data).decode('utf-8')
-        config = json.loads(decoded_data)
-        logger.debug(f"Successfully parsed VMess link: {config.get('ps', 'NoName')}")
-        return config
-    except Exception as e:
-        logger.error(f"Error parsing VMess link (base64/JSON issue) for {vmess_link[:50]}...: {e}")
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+def _parse_query(query):
+    """
+    Single-pass query string parser. Returns {name: first value}, with the same
+    rules as urllib.parse.parse_qs: '+' is a space, blank values are dropped.
+    """
+    params = {}
+    if not query:
+        return params
+    for pair in query.split('&'):
+        name, has_value, value = pair.partition('=')
+        if not has_value or not value:
+            continue
+        if '%' in name or '+' in name:
+            name = urllib.parse.unquote_plus(name)
+        if name in params:
+            continue
+        if '%' in value or '+' in value:
+            value = urllib.parse.unquote_plus(value)
+        params[name] = value
+    return params
+
+def _split_url_rest(rest):
+    """
+    Splits what follows "scheme://" into (authority, query, fragment),
+    the same way urllib.parse.urlsplit does, in one scan.
+    """
+    if '\t' in rest or '\r' in rest or '\n' in rest:
+        rest = rest.translate(_URL_UNSAFE_CHARS)
+    fragment = ""
+    hash_index = rest.find('#')
+    if hash_index != -1:
+        rest, fragment = rest[:hash_index], rest[hash_index + 1:]
+    query = ""
+    query_index = rest.find('?')
+    if query_index != -1:
+        rest, query = rest[:query_index], rest[query_index + 1:]
+    slash_index = rest.find('/')
+    authority = rest if slash_index == -1 else rest[:slash_index]
+    return authority, query, fragment
+
+def _split_host_port(host_port):
+    """Returns (server, port) from "server:port", or (None, None) if malformed."""
+    server, sep, port = host_port.partition(':')
+    if not sep or ':' in port:
+        return None, None
+    port = _to_int(port)
+    if port is None:
+        return None, None
+    return server, port
+
+def _build_tls(server_name, fingerprint, alpn):
+    """Shared Sing-Box TLS block builder for all link types."""
+    tls = {
+        "enabled": True,
+        "server_name": server_name,
+        "insecure": False,
+        "disable_sni": False
+    }
+    if fingerprint:
+        tls["utls"] = {"enabled": True, "fingerprint": fingerprint}
+    if alpn:
+        tls["alpn"] = alpn.split(',')
+    return tls
+
+def _build_transport(transport_type, path, host, service_name):
+    """Shared Sing-Box transport block builder. Returns None for plain TCP."""
+    if transport_type == "ws":
+        return {
+            "type": "ws",
+            "path": path,
+            "headers": {"Host": host}
+        }
+    if transport_type == "grpc":
+        return {"type": "grpc", "grpc_service_name": service_name}
+    return None
+
+def _parse_vmess(link_str, rest):
+    vmess_config, error = _decode_vmess_payload(rest)
+    if vmess_config is None:
+        return ParsedLink(None, None, error)
+    return _vmess_config_to_outbound(vmess_config)
+
+def _vmess_config_to_outbound(vmess_config):
+    if not vmess_config:
+        return _link_error("empty VMess config", "empty_config")
+
+    server_port = _to_int(vmess_config.get("port"))
+    alter_id = _to_int(vmess_config.get("aid", 0))
+    if server_port is None or alter_id is None:
+        return _link_error("invalid port/aid", "invalid_port")
+
+    original_tag_name = vmess_config.get("ps")
+    if original_tag_name is not None and not isinstance(original_tag_name, str):
+        return _link_error("invalid ps", "invalid_name")
+
+    outbound = {
+        "tag": original_tag_name,
+        "type": "vmess",
+        "server": vmess_config.get("add"),
+        "server_port": server_port,
+        "uuid": vmess_config.get("id"),
+        "security": vmess_config.get("scy", "auto"),
+        "alterId": alter_id,
+        "network": vmess_config.get("net", "tcp"),
+    }
+    if vmess_config.get("tls", "") == "tls":
+        alpn = vmess_config.get("alpn")
+        if alpn and not isinstance(alpn, str):
+            return _link_error("invalid alpn", "invalid_alpn")
+        outbound["tls"] = _build_tls(vmess_config.get("host", vmess_config.get("add")), vmess_config.get("fp"), alpn)
+
+    transport = _build_transport(
+        vmess_config.get("net", "tcp"),
+        vmess_config.get("path", "/"),
+        vmess_config.get("host", ""),
+        vmess_config.get("path", "")
+    )
+    if transport:
+        outbound["transport"] = transport
+    return ParsedLink(outbound, original_tag_name, None)
+
+def _parse_url_link(rest, link_type):
+    """
+    Common single-pass parsing for URL style links (VLESS/Trojan).
+    Returns (credential, server, port, params, fragment, error).
+    """
+    authority, query, fragment = _split_url_rest(rest)
+    if '[' in authority or ']' in authority:
+        return None, None, None, None, None, LinkError("IPv6 address not supported", "ipv6_unsupported")
+
+    if link_type == "vless":
+        user_info, at_sign, server_info = authority.partition('@')
+        if not at_sign or '@' in server_info:
+            return None, None, None, None, None, LinkError("missing or ambiguous user info", "invalid_user_info")
+        credential = user_info
+    else:
+        # Sama seperti urlparse().username + netloc.split('@')[1] versi lama
+        parts = authority.split('@')
+        server_info = parts[1] if len(parts) > 1 else parts[0]
+        credential = authority.rpartition('@')[0].partition(':')[0] if len(parts) > 1 else None
+
+    server, port = _split_host_port(server_info)
+    if server is None:
+        return None, None, None, None, None, LinkError("invalid server:port", "invalid_server_port")
+    return credential, server, port, _parse_query(query), fragment, None
+
+def _parse_vless(link_str, rest):
+    uuid, server, port, params, fragment, error = _parse_url_link(rest, "vless")
+    if error:
+        return ParsedLink(None, None, error)
+
+    original_tag_name = urllib.parse.unquote(fragment) if fragment else f"VLESS_Node_{server}"
+    transport_type = params.get("type", "tcp")
+    outbound = {
+        "tag": original_tag_name,
+        "type": "vless",
+        "server": server,
+        "server_port": port,
+        "uuid": uuid,
+        "network": transport_type,
+    }
+    if params.get("security") == "tls":
+        outbound["tls"] = _build_tls(params.get("sni", server), params.get("fp"), params.get("alpn"))
+
+    transport = _build_transport(transport_type, params.get("path", "/"), params.get("host", ""), params.get("serviceName", ""))
+    if transport:
+        outbound["transport"] = transport
+    return ParsedLink(outbound, original_tag_name, None)
+
+def _parse_trojan(link_str, rest):
+    password, server, port, params, fragment, error = _parse_url_link(rest, "trojan")
+    if error:
+        return ParsedLink(None, None, error)
+
+    original_tag_name = urllib.parse.unquote(fragment) if fragment else f"Trojan_Node_{server}"
+    outbound = {
+        "tag": original_tag_name,
+        "type": "trojan",
+        "server": server,
+        "server_port": port,
+        "password": password,
+    }
+    if params.get("security") == "tls" or "sni" in params:
+        outbound["tls"] = _build_tls(params.get("sni", server), params.get("fp"), params.get("alpn"))
+
+    transport = _build_transport(params.get("type", "tcp"), params.get("path", "/"), params.get("host", ""), params.get("serviceName", ""))
+    if transport:
+        outbound["transport"] = transport
+    return ParsedLink(outbound, original_tag_name, None)
+
+# Registry parser per skema link. Tambahkan protokol baru di sini.
+LINK_PARSERS = {
+    "vmess": _parse_vmess,
+    "vless": _parse_vless,
+    "trojan": _parse_trojan,
+}
+
+def parse_link(link_str):
+    """
+    Parses a VMess, VLESS, or Trojan link string into a Sing-Box outbound (without the final tag).
+    Dispatches on the scheme via LINK_PARSERS and never raises for malformed input:
+    returns a ParsedLink whose `error` is set when the link can't be converted.
+    original_tag_name is None when a VMess link has no "ps" name, because the
+    fallback name depends on the node counter.
+    """
+    scheme, sep, rest = link_str.partition("://")
+    parser = LINK_PARSERS.get(scheme) if sep else None
+    if parser is None:
+        return _link_error("unsupported link type", "unsupported_scheme")
+    return parser(link_str, rest)
+
+@functools.lru_cache(maxsize=4096)
+def _format_tag_prefix(original_tag_name):
+    """
+    Builds the node tag without its counter: country emoji + cleaned ISP/original name.
+    The final tag is this prefix followed by " #<node_counter>".
+    """
+    # Logika pembentukan tag baru: simbol bendera + nama ISP/nama asli + nomor urut
+    display_name = original_tag_name
+    country_code = ""
+    
+    # Coba ekstrak kode negara (misal US, SG, ID) dari awal nama
+    match_country = _COUNTRY_PREFIX_RE.match(display_name)
+    if match_country:
+        country_code = match_country.group(1).upper()
+        remaining_name = match_country.group(2).strip()
+        display_name = remaining_name
+    
+    # Hapus bagian dalam kurung siku jika ada (misal [VLESS-TLS])
+    display_name = _BRACKET_RE.sub('', display_name).strip()
+
+    # Cek apakah nama display_name sudah cukup informatif, kalau tidak, pakai original_tag_name utuh
+    # Atau jika setelah dibersihkan jadi kosong, pakai nama aslinya
+    if not display_name or display_name.lower().startswith(("vmess", "vless", "trojan", "node")):
+        display_name = original_tag_name.replace('_', ' ').strip() # Ganti underscore jadi spasi
+
+    emoji = get_emoji_from_country_code(country_code)
+    return f"{emoji} {display_name}"
+
+def _tag_prefix_for(parsed):
+    if parsed.original_tag_name is None:
         return None
+    return _format_tag_prefix(parsed.original_tag_name)
+
+def _finalize_outbound(outbound, tag_prefix, node_counter):
+    # tag_prefix None berarti VMess tanpa "ps": nama fallback-nya bergantung pada node_counter
+    if tag_prefix is None:
+        tag_prefix = _format_tag_prefix(f"VMess_Node_{node_counter}")
+    outbound["tag"] = f"{tag_prefix} #{node_counter}".strip()
+    logger.debug("Converted link to Sing-Box outbound with formatted tag: %s", outbound["tag"])
+    return outbound
 
-def convert_link_to_singbox_outbound(link_str, node_counter):
+def convert_link_to_singbox_outbound(link_str, node_counter, cache=None):
     """
     Converts a VMess, VLESS, or Trojan link string to a Sing-Box outbound configuration.
     Returns a dictionary of Sing-Box outbound config, or None if conversion fails.
     Adds a unique and formatted tag based on country emoji, ISP, and counter.
+    An optional OutboundCache skips re-parsing links that were seen before.
     """
-    outbound = None
-    original_tag_name = "Node"
-    country_code = ""
+    outbound, tag_prefix, error = _resolve_link(link_str, cache)
+    if error:
+        logger.warning(f"Failed to convert link ({error}): {link_str[:50]}...")
+        return None
+    return _finalize_outbound(outbound, tag_prefix, node_counter)
 
-    if link_str.startswith("vmess://"):
-        vmess_config = parse_vmess_link(link_str)
-        if not vmess_config:
-            return None
-        
-        original_tag_name = vmess_config.get("ps", f"VMess_Node_{node_counter}")
-        outbound = {
-            "tag": original_tag_name, 
-            "type": "vmess",
-            "server": vmess_config.get("add"),
-            "server_port": int(vmess_config.get("port")),
-            "uuid": vmess_config.get("id"),
-            "security": vmess_config.get("scy", "auto"),
-            "alterId": int(vmess_config.get("aid", 0)),
-            "network": vmess_config.get("net", "tcp"),
+def _resolve_link(link, cache=None):
+    """
+    Parses one link, going through `cache` (an OutboundCache) when given.
+    Returns (outbound, tag_prefix, error); outbound is None when error is set.
+    """
+    if cache is not None:
+        cached = cache.get(link)
+        if cached is not None:
+            return cached
+    parsed = parse_link(link)
+    if parsed.error:
+        result = (None, None, parsed.error)
+    else:
+        result = (parsed.outbound, _tag_prefix_for(parsed), None)
+    if cache is not None:
+        cache.put(link, *result)
+    return result
+
+def _resolve_links(links, cache=None, stats=None):
+    """
+    _resolve_link for a list of links: cache lookups first, then the misses are parsed.
+    Returns a list of (outbound, tag_prefix, error) in input order.
+    """
+    with _stage(stats, "link_parse"):
+        results = [cache.get(link) for link in links] if cache is not None else [None] * len(links)
+        miss_indexes = [index for index, result in enumerate(results) if result is None]
+        parsed_misses = [parse_link(links[index]) for index in miss_indexes]
+    with _stage(stats, "tag_format"):
+        for index, parsed in zip(miss_indexes, parsed_misses):
+            if parsed.error:
+                result = (None, None, parsed.error)
+            else:
+                result = (parsed.outbound, _tag_prefix_for(parsed), None)
+            if cache is not None:
+                cache.put(links[index], *result)
+            results[index] = result
+    return results
+
+def _convert_link_chunk(links):
+    """
+    Worker for the process pool: parses a chunk of links without assigning node numbers.
+    Returns a list of (outbound, tag_prefix, error) in input order.
+    """
+    return _resolve_links(links)
+
+def _copy_json(value):
+    # Salinan dalam untuk struktur JSON (dict/list), jauh lebih cepat dari copy.deepcopy
+    if isinstance(value, dict):
+        return {k: _copy_json(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_copy_json(v) for v in value]
+    return value
+
+class OutboundCache:
+    """
+    Content-addressed LRU cache of parsed links, keyed by a hash of the raw link string.
+    Entries hold the outbound without its node number, so they stay reusable when a
+    link changes position between runs; the `#N` tag is applied fresh on every use.
+    Failed links are cached in memory only. With `path`, successful entries are also
+    persisted to a SQLite file so later runs only parse new or changed links. Pending
+    writes are flushed once CACHE_FLUSH_THRESHOLD of them pile up and at the end of
+    every process_singbox_config/write_singbox_config; close() (or using it as a
+    context manager) flushes the rest. The file is
+    stamped with CACHE_FORMAT_VERSION and wiped when it was written by another version,
+    so a parser change never keeps serving old results.
+    """
+
+    def __init__(self, max_entries=OUTBOUND_CACHE_MAX_ENTRIES, path=None):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._dirty = {}
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            with self._db:
+                version = self._db.execute("PRAGMA user_version").fetchone()[0]
+                if version != CACHE_FORMAT_VERSION:
+                    if version:
+                        logger.info(f"Cache outbound {path} dari versi format {version}, dibuang (sekarang {CACHE_FORMAT_VERSION}).")
+                    self._db.execute("DROP TABLE IF EXISTS outbound_cache")
+                    self._db.execute(f"PRAGMA user_version = {CACHE_FORMAT_VERSION:d}")
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS outbound_cache ("
+                    "key BLOB PRIMARY KEY, outbound TEXT, tag_prefix TEXT, error TEXT, used_at REAL)"
+                )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def key_for(link):
+        return hashlib.blake2b(link.encode('utf-8'), digest_size=16).digest()
+
+    def _remember(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, link):
+        """Returns (outbound, tag_prefix, error) with a fresh outbound dict, or None on a miss."""
+        key = self.key_for(link)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            elif self._db is not None:
+                row = self._db.execute(
+                    "SELECT outbound, tag_prefix, error FROM outbound_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    outbound_json, tag_prefix, error = row
+                    entry = (json.loads(outbound_json) if outbound_json is not None else None, tag_prefix, error)
+                    self._remember(key, entry)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            if self._db is not None and entry[2] is None:
+                self._dirty[key] = entry # Update used_at saat flush
+            flush = len(self._dirty) >= CACHE_FLUSH_THRESHOLD
+        if flush:
+            self.flush()
+        outbound, tag_prefix, error = entry
+        # Selalu kembalikan salinan karena tag-nya akan ditimpa pemanggil
+        return _copy_json(outbound), tag_prefix, error
+
+    def put(self, link, outbound, tag_prefix, error):
+        entry = (_copy_json(outbound), tag_prefix, error)
+        key = self.key_for(link)
+        with self._lock:
+            self._remember(key, entry)
+            # Link gagal nggak ditulis ke disk, jadi perbaikan parser langsung berlaku di run berikutnya
+            if self._db is not None and error is None:
+                self._dirty[key] = entry
+            flush = len(self._dirty) >= CACHE_FLUSH_THRESHOLD
+        if flush:
+            self.flush()
+
+    def flush(self):
+        """Writes new and recently used entries to the on-disk store and prunes it to max_entries."""
+        if self._db is None:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            now = time.time()
+            rows = [
+                (key, json.dumps(outbound) if outbound is not None else None, tag_prefix, error, now)
+                for key, (outbound, tag_prefix, error) in self._dirty.items()
+            ]
+            self._dirty.clear()
+            with self._db:
+                self._db.executemany("INSERT OR REPLACE INTO outbound_cache VALUES (?, ?, ?, ?, ?)", rows)
+                self._db.execute(
+                    "DELETE FROM outbound_cache WHERE key NOT IN "
+                    "(SELECT key FROM outbound_cache ORDER BY used_at DESC LIMIT ?)",
+                    (self.max_entries,)
+                )
+
+    def close(self):
+        if self._db is None:
+            return
+        self.flush()
+        self._db.close()
+        self._db = None
+
+class ConversionStats:
+    """
+    Wall time per pipeline stage and counters of a conversion.
+    Pass one (or stats=True) to process_singbox_config / write_singbox_config to get
+    `stats` in the result dict; `sink` is called with the stats after every conversion,
+    e.g. a callback or prometheus_file_sink(). Without stats nothing is recorded.
+    """
+
+    def __init__(self, sink=None):
+        self.sink = sink
+        self.stages = collections.defaultdict(float) # nama stage -> detik
+        self.counters = collections.Counter()
+        self.failures = collections.Counter() # (protokol, alasan) -> jumlah link gagal
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] += time.perf_counter() - start
+
+    def count(self, name, value=1):
+        self.counters[name] += value
+
+    def record_failure(self, link, error):
+        # Protokol di luar LINK_PARSERS digabung, alasan pakai kode LinkError.reason supaya label tetap sedikit
+        scheme, sep, _ = link.partition("://")
+        protocol = scheme.lower() if sep and scheme.lower() in LINK_PARSERS else "other"
+        self.failures[(protocol, getattr(error, "reason", "other"))] += 1
+        self.counters["failed"] += 1
+
+    def as_dict(self):
+        return {
+            "stages_ms": {name: round(seconds * 1000, 3) for name, seconds in self.stages.items()},
+            "counters": dict(self.counters),
+            "failures": [
+                {"protocol": protocol, "reason": reason, "count": count}
+                for (protocol, reason), count in sorted(self.failures.items())
+            ],
         }
-        if vmess_config.get("tls", "") == "tls":
-            outbound["tls"] = {
-                "enabled": True,
-                "server_name": vmess_config.get("host", vmess_config.get("add")),
-                "insecure": False,
-                "disable_sni": False
-            }
-            if vmess_config.get("fp"):
-                outbound["tls"]["utls"] = {"enabled": True, "fingerprint": vmess_config["fp"]}
-            if vmess_config.get("alpn"):
-                outbound["tls"]["alpn"] = vmess_config["alpn"].split(',')
-
-        transport_type = vmess_config.get("net", "tcp")
-        transport_settings = {}
-        if transport_type == "ws":
-            transport_settings = {
-                "type": "ws",
-                "path": vmess_config.get("path", "/"),
-                "headers": {"Host": vmess_config.get("host", "")}
-            }
-        elif transport_type == "grpc":
-            transport_settings = {"type": "grpc", "grpc_service_name": vmess_config.get("path", "")}
-        if transport_settings:
-            outbound["transport"] = transport_settings
-    
-    elif link_str.startswith("vless://"):
+
+    def to_prometheus(self, prefix="singbox_converter"):
+        """Renders the stats in the Prometheus text exposition format."""
+        lines = [
+            f"# HELP {prefix}_stage_seconds Wall time per conversion stage.",
+            f"# TYPE {prefix}_stage_seconds gauge",
+        ]
+        lines += [f'{prefix}_stage_seconds{{stage="{_prometheus_label(name)}"}} {seconds:.6f}' for name, seconds in self.stages.items()]
+        for name, value in sorted(self.counters.items()):
+            lines += [f"# TYPE {prefix}_{name} gauge", f"{prefix}_{name} {value}"]
+        if self.failures:
+            lines.append(f"# TYPE {prefix}_failed_links gauge")
+            lines += [
+                f'{prefix}_failed_links{{protocol="{_prometheus_label(protocol)}",reason="{_prometheus_label(reason)}"}} {count}'
+                for (protocol, reason), count in sorted(self.failures.items())
+            ]
+        return "\n".join(lines) + "\n"
+
+    def emit(self):
+        if self.sink is None:
+            return
         try:
-            parsed_url = urllib.parse.urlparse(link_str)
-            user_info, server_info = parsed_url.netloc.split('@')
-            uuid = user_info
-            server, port = server_info.split(':')
-            params = urllib.parse.parse_qs(parsed_url.query)
-            
-            original_tag_name = urllib.parse.unquote(parsed_url.fragment) if parsed_url.fragment else f"VLESS_Node_{server}"
-            outbound = {
-                "tag": original_tag_name,
-                "type": "vless",
-                "server": server,
-                "server_port": int(port),
-                "uuid": uuid,
-                "network": params.get("type", ["tcp"])[0],
-            }
-            if "security" in params and params["security"][0] == "tls":
-                outbound["tls"] = {
-                    "enabled": True,
-                    "server_name": params.get("sni", [server])[0],
-                    "insecure": False,
-                    "disable_sni": False
-                }
-                if params.get("fp"):
-                    outbound["tls"]["utls"] = {"enabled": True, "fingerprint": params["fp"][0]}
-                if params.get("alpn"):
-                    outbound["tls"]["alpn"] = params["alpn"][0].split(',')
-
-            transport_type = params.get("type", ["tcp"])[0]
-            transport_settings = {}
-            if transport_type == "ws":
-                transport_settings = {
-                    "type": "ws",
-                    "path": params.get("path", ["/"])[0],
-                    "headers": {"Host": params.get("host", [""])[0]}
-                }
-            elif transport_type == "grpc":
-                transport_settings = {"type": "grpc", "grpc_service_name": params.get("serviceName", [""])[0]}
-            if transport_settings:
-                outbound["transport"] = transport_settings
+            self.sink(self)
         except Exception as e:
-            logger.error(f"Error parsing VLESS link for {link_str[:50]}...: {e}")
-            return None
-    
-    elif link_str.startswith("trojan://"):
+            # Sink metrics gagal (disk penuh, dll) nggak boleh bikin konversi ikut gagal
+            logger.warning(f"Stats sink gagal: {e}")
+
+def _prometheus_label(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def prometheus_file_sink(path, prefix="singbox_converter"):
+    """
+    Returns a stats sink that writes ConversionStats to `path` in Prometheus text format
+    (e.g. for the node_exporter textfile collector). The file is replaced atomically.
+    """
+    def sink(stats):
+        directory = os.path.dirname(os.path.abspath(path))
+        with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=directory, delete=False) as f:
+            try:
+                f.write(stats.to_prometheus(prefix))
+                f.close()
+                os.replace(f.name, path)
+            except BaseException:
+                f.close()
+                os.unlink(f.name) # File sementara jangan ditinggal kalau gagal ditulis/dipindah
+                raise
+    return sink
+
+# Dipakai kalau stats mati: context manager kosong tanpa alokasi baru
+_NO_STAGE = contextlib.nullcontext()
+
+def _stage(stats, name):
+    return stats.stage(name) if stats is not None else _NO_STAGE
+
+def _make_stats(stats):
+    # stats boleh None/False (mati), True (objek baru), atau ConversionStats yang sudah ada
+    if stats is True:
+        return ConversionStats()
+    return stats or None
+
+def _iter_text_lines(text):
+    # Pecah string per '\n' tanpa bikin list semua baris sekaligus
+    start = 0
+    while True:
+        end = text.find('\n', start)
+        if end == -1:
+            yield text[start:]
+            return
+        yield text[start:end]
+        start = end + 1
+
+def iter_links(source):
+    """
+    Yields stripped, non-empty links from a newline-separated string,
+    a file object (text or binary), or any iterable of lines.
+    Lines are produced lazily, so the input is never split into a full list.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = source.decode('utf-8')
+    lines = _iter_text_lines(source) if isinstance(source, str) else source
+    for line in lines:
+        if isinstance(line, (bytes, bytearray)):
+            line = line.decode('utf-8', errors='replace')
+        link = line.strip()
+        if link:
+            yield link
+
+def decode_subscription(blob):
+    """
+    Bulk decoder for a subscription body (bytes, bytearray, memoryview or str): either
+    a base64 blob wrapping newline-separated links (standard or URL-safe, padding
+    optional) or the plain link list itself. The outer base64 layer is normalized and
+    decoded in one pass and lines are split in C, without per-line bytes objects.
+    Returns a list of links.
+    """
+    if isinstance(blob, str):
+        data = blob.encode('utf-8')
+    else:
+        data = bytes(blob)
+    # Base64 tidak pernah berisi ':', jadi cek satu byte (memchr) cukup untuk membedakan dari list link biasa
+    if b":" not in data:
+        if b"-" in data or b"_" in data:
+            data = data.translate(_B64_URLSAFE_TO_STD_BYTES)
         try:
-            parsed_url = urllib.parse.urlparse(link_str)
-            password = parsed_url.username
-            server, port = parsed_url.netloc.split('@')[1].split(':') if '@' in parsed_url.netloc else parsed_url.netloc.split(':')
-            params = urllib.parse.parse_qs(parsed_url.query)
-            
-            original_tag_name = urllib.parse.unquote(parsed_url.fragment) if parsed_url.fragment else f"Trojan_Node_{server}"
-            outbound = {
-                "tag": original_tag_name,
-                "type": "trojan",
-                "server": server,
-                "server_port": int(port),
-                "password": password,
-            }
-            if "security" in params and params["security"][0] == "tls" or "sni" in params:
-                outbound["tls"] = {
-                    "enabled": True,
-                    "server_name": params.get("sni", [server])[0],
-                    "insecure": False,
-                    "disable_sni": False
-                }
-                if params.get("fp"):
-                    outbound["tls"]["utls"] = {"enabled": True, "fingerprint": params["fp"][0]}
-                if params.get("alpn"):
-                    outbound["tls"]["alpn"] = params["alpn"][0].split(',')
-
-            transport_type = params.get("type", ["tcp"])[0]
-            transport_settings = {}
-            if transport_type == "ws":
-                transport_settings = {
-                    "type": "ws",
-                    "path": params.get("path", ["/"])[0],
-                    "headers": {"Host": params.get("host", [""])[0]}
-                }
-            elif transport_type == "grpc":
-                transport_settings = {"type": "grpc", "grpc_service_name": params.get("serviceName", [""])[0]}
-            if transport_settings:
-                outbound["transport"] = transport_settings
-        except Exception as e:
-            logger.error(f"Error parsing Trojan link for {link_str[:50]}...: {e}")
-            return None
+            # a2b_base64 sudah melewati whitespace/newline, jadi blob yang rapi langsung di-decode sekali jalan
+            data = binascii.a2b_base64(data)
+        except ValueError:
+            # Padding hilang atau tidak pas: buang whitespace dan '=', lalu hitung ulang padding-nya
+            data = data.translate(None, b" \t\r\n\x0b\x0c").rstrip(b"=")
+            data += b"=" * (-len(data) % 4)
+            try:
+                data = binascii.a2b_base64(data)
+            except ValueError as e:
+                logger.error(f"Subscription bukan base64 yang valid: {e}")
+                return []
+    text = data.decode('utf-8', errors='replace')
+    return [link for link in map(str.strip, text.split('\n')) if link]
+
+# Jumlah byte awal input yang dicek untuk menebak apakah input adalah blob base64 subscription
+_SNIFF_SIZE = 4096
+_GZIP_MAGIC = b"\x1f\x8b"
+
+def _looks_like_subscription_blob(head):
+    # Blob base64 tidak pernah berisi "://", sedangkan list link biasa pasti punya di baris pertamanya
+    return bool(head.strip()) and b"://" not in head
+
+def iter_subscription_file(f, chunk_size=SUBSCRIPTION_CHUNK_SIZE):
+    """
+    Yields the links of a base64 subscription blob read from binary file object `f`,
+    decoding chunk_size bytes at a time, so only one chunk of encoded and decoded data
+    is in memory at once. Standard and URL-safe alphabets are accepted, padding is
+    optional and whitespace (or anything else outside the alphabet) is skipped.
+    """
+    pending = b"" # Sisa base64 yang belum kelipatan 4 karakter
+    partial = b"" # Baris terakhir chunk sebelumnya yang belum lengkap
+    while True:
+        chunk = f.read(chunk_size)
+        if chunk:
+            data = pending + chunk.translate(_B64_URLSAFE_TO_STD_BYTES, _B64_NON_ALPHABET)
+            cut = len(data) - len(data) % 4
+            data, pending = data[:cut], data[cut:]
+        elif len(pending) % 4 == 1:
+            data = b"" # Satu karakter sisa bukan base64 yang bisa di-decode
+        else:
+            data = pending + b"=" * (-len(pending) % 4)
+        lines = (partial + binascii.a2b_base64(data)).split(b"\n")
+        partial = lines.pop() if chunk else b""
+        for line in lines:
+            link = line.strip()
+            if link:
+                yield link.decode('utf-8', errors='replace')
+        if not chunk:
+            return
 
+def read_links_file(f, subscription=None):
+    """
+    Links from a seekable binary file object (an open file, an uploaded file buffer):
+    a plain link list, a base64 subscription blob, or either one gzip-compressed.
+    Both are returned lazily: plain lists as iter_links() over the file, read line by
+    line, base64 blobs through iter_subscription_file(), so the whole text is never
+    held in memory. subscription=None guesses the format from the first bytes.
+    """
+    if f.read(len(_GZIP_MAGIC)) == _GZIP_MAGIC:
+        f.seek(0)
+        f = gzip.GzipFile(fileobj=f, mode="rb")
     else:
-        logger.warning(f"Unsupported link type for conversion: {link_str[:50]}...")
-        return None
+        f.seek(0)
+    head = f.read(_SNIFF_SIZE)
+    f.seek(0)
+    if subscription or (subscription is None and _looks_like_subscription_blob(head)):
+        return iter_subscription_file(f)
+    return iter_links(f)
+
+class LinkInput:
+    """
+    Re-iterable link input made of parts, in order: lists of links (add_links) and
+    seekable binary files (add_file, read with read_links_file()). Files are read
+    again on every iteration instead of being kept as a list, so the same input can
+    be hashed and then converted. `size` is the input size (file bytes, link
+    characters) and `position` how much of it the current iteration has consumed.
+    """
+
+    def __init__(self):
+        self._parts = [] # list link, atau (file, subscription, ukuran)
+        self.size = 0
+        self._done = 0
+        self._file = None
+
+    def add_links(self, links):
+        links = list(links)
+        self._parts.append(links)
+        self.size += sum(len(link) + 1 for link in links)
+
+    def add_file(self, f, subscription=None):
+        size = f.seek(0, os.SEEK_END)
+        f.seek(0)
+        self._parts.append((f, subscription, size))
+        self.size += size
 
-    if outbound:
-        # Logika pembentukan tag baru: simbol bendera + nama ISP/nama asli + nomor urut
-        display_name = original_tag_name
-        country_code = ""
+    @property
+    def position(self):
+        # Posisi file mentah (untuk gzip: byte terkompresi), jadi cocok dengan size
+        f = self._file
+        return self._done + (f.tell() if f is not None else 0)
+
+    def __iter__(self):
+        self._done = 0
+        for part in self._parts:
+            if isinstance(part, list):
+                for link in part:
+                    self._done += len(link) + 1
+                    yield link
+                continue
+            f, subscription, size = part
+            f.seek(0)
+            self._file = f
+            try:
+                yield from read_links_file(f, subscription)
+            finally:
+                self._file = None
+            self._done += size
+
+def _identity_part(value):
+    # Nilai dari JSON VMess bisa berupa list/dict (unhashable): semua komponen jadi str atau None
+    if value is None or isinstance(value, str):
+        return value
+    return json.dumps(value, sort_keys=True, ensure_ascii=False)
+
+def node_identity(outbound):
+    """
+    Normalized identity of a converted node: (type, server, server_port, uuid/password,
+    transport, TLS SNI). Two links with the same identity reach the same endpoint,
+    whatever their names are. Every component is a str or None, so the identity is
+    always hashable whatever the link decoded to.
+    """
+    transport = outbound.get("transport")
+    if transport:
+        headers = transport.get("headers")
+        transport = (
+            _identity_part(transport.get("type")),
+            _identity_part(transport.get("path")),
+            _identity_part(headers.get("Host") if isinstance(headers, dict) else None),
+            _identity_part(transport.get("grpc_service_name")),
+        )
+    tls = outbound.get("tls")
+    sni = tls.get("server_name") if tls and tls.get("enabled") else None
+    server = outbound.get("server")
+    if isinstance(server, str):
+        server = server.strip().lower()
+    return (
+        _identity_part(outbound.get("type")),
+        _identity_part(server),
+        _identity_part(outbound.get("server_port")),
+        _identity_part(outbound.get("uuid") or outbound.get("password")),
+        transport,
+        _identity_part(sni),
+    )
+
+class NodeIndex:
+    """
+    Hash index of node identities used to drop duplicate nodes in O(N).
+    The first occurrence of an identity is kept; `dropped` counts the rest.
+    """
+
+    def __init__(self):
+        self._seen = set()
+        self.dropped = 0
+
+    def add(self, outbound):
+        """Returns True if the node is new, False (and counts it) if it is a duplicate."""
+        key = node_identity(outbound)
+        if key in self._seen:
+            self.dropped += 1
+            return False
+        self._seen.add(key)
+        return True
+
+def iter_singbox_outbounds(links, start_counter=1, cache=None, dedup=None, stats=None):
+    """
+    Generator that converts links one by one and yields Sing-Box outbound dicts.
+    `links` may be anything accepted by iter_links(). Failed links are logged and
+    skipped without consuming a node number, same as process_singbox_config.
+    With a NodeIndex as `dedup`, duplicate nodes are dropped the same way.
+    A ConversionStats as `stats` records stage times and counters per chunk.
+    """
+    node_counter = start_counter
+    for chunk in _iter_chunks(iter_links(links), LINK_BATCH_SIZE):
+        outbounds = _finalize_chunk(chunk, _resolve_links(chunk, cache, stats), node_counter, dedup, stats)
+        node_counter += len(outbounds)
+        yield from outbounds
+
+def _finalize_chunk(chunk, results, node_counter, dedup=None, stats=None):
+    """
+    Turns the resolved (outbound, tag_prefix, error) results of a chunk into numbered
+    outbounds, logging failed links and skipping them and duplicates.
+    """
+    outbounds = []
+    with _stage(stats, "tag_format"):
+        for link, (outbound, tag_prefix, error) in zip(chunk, results):
+            if error:
+                logger.warning(f"Failed to convert link ({error}): {link}")
+                if stats is not None:
+                    stats.record_failure(link, error)
+                continue
+            if dedup is not None and not dedup.add(outbound):
+                continue
+            outbounds.append(_finalize_outbound(outbound, tag_prefix, node_counter + len(outbounds)))
+    if stats is not None:
+        stats.count("links_in", len(chunk))
+        stats.count("converted", len(outbounds))
+    return outbounds
+
+def _iter_chunks(iterable, chunk_size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def iter_singbox_outbounds_parallel(links, start_counter=1, max_workers=None,
+                                    chunk_size=PARALLEL_CHUNK_SIZE, min_links=PARALLEL_MIN_LINKS, cache=None, dedup=None,
+                                    stats=None):
+    """
+    Like iter_singbox_outbounds, but parses chunks of links in a process pool.
+    Node numbering and order are identical to the serial path: workers only parse,
+    the `#N` counter is applied here in input order.
+    Inputs with fewer than `min_links` links are converted serially so small
+    conversions don't pay the pool startup cost. Only a bounded window of chunks
+    is in flight at once, so streaming inputs stay streaming.
+    With a cache, hits are resolved here and only misses are sent to the workers.
+    Duplicate nodes are dropped before numbering when a NodeIndex is given as `dedup`.
+    With `stats`, link_parse is the time spent waiting on the workers (tag prefixes are
+    formatted there too); tag_format only covers numbering in this process.
+    """
+    link_iter = iter_links(links)
+    first_links = list(itertools.islice(link_iter, min_links))
+    if len(first_links) < min_links:
+        logger.debug("Only %d links, below parallel threshold %d. Converting serially.", len(first_links), min_links)
+        yield from iter_singbox_outbounds(first_links, start_counter, cache, dedup, stats)
+        return
+
+    node_counter = start_counter
+    chunks = _iter_chunks(itertools.chain(first_links, link_iter), chunk_size)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+        max_in_flight = (max_workers or os.cpu_count() or 1) * 2
+        for chunk, results in _iter_ordered_chunk_results(executor, chunks, max_in_flight, cache, stats):
+            outbounds = _finalize_chunk(chunk, results, node_counter, dedup, stats)
+            node_counter += len(outbounds)
+            yield from outbounds
+
+def _submit_chunk(executor, chunk, cache):
+    # Link yang sudah ada di cache tidak perlu dikirim ke worker
+    cached = [cache.get(link) for link in chunk] if cache is not None else [None] * len(chunk)
+    misses = [link for link, hit in zip(chunk, cached) if hit is None]
+    future = executor.submit(_convert_link_chunk, misses) if misses else None
+    return chunk, cached, future
+
+def _collect_chunk(submitted, cache, stats=None):
+    chunk, cached, future = submitted
+    with _stage(stats, "link_parse"):
+        parsed_misses = iter(future.result()) if future is not None else iter(())
+    results = []
+    for link, hit in zip(chunk, cached):
+        if hit is None:
+            hit = next(parsed_misses)
+            if cache is not None:
+                cache.put(link, *hit)
+        results.append(hit)
+    return chunk, results
+
+def _iter_ordered_chunk_results(executor, chunks, max_in_flight, cache=None, stats=None):
+    # Ambil hasil sesuai urutan submit supaya penomoran tetap deterministik
+    pending = collections.deque()
+    for chunk in chunks:
+        pending.append(_submit_chunk(executor, chunk, cache))
+        if len(pending) >= max_in_flight:
+            yield _collect_chunk(pending.popleft(), cache, stats)
+    while pending:
+        yield _collect_chunk(pending.popleft(), cache, stats)
+
+def _plan_outbounds(template_outbounds):
+    """
+    Splits the template outbounds around the slot where converted nodes go.
+    Returns (head, tail_candidates, default_outbounds):
+    head holds the initial selectors/urltests in the desired order (with placeholders
+    for missing ones), tail_candidates the remaining template outbounds, and
+    default_outbounds the fixed outbounds appended at the end. Template outbounds and
+    defaults whose tag collides with a converted node are dropped at instantiate time.
+    """
+    # Default fixed outbounds
+    direct_outbound = {"type": "direct", "tag": "direct"}
+    bypass_outbound = {"type": "direct", "tag": "bypass"}
+    block_outbound = {"type": "block", "tag": "block"}
+    dns_out_outbound = {"type": "dns", "tag": "dns-out"}
+
+    existing_default_tags = ["direct", "bypass", "block", "dns-out"]
+
+    template_outbound_map = {o["tag"]: o for o in template_outbounds if "tag" in o}
+
+    head = []
+
+    desired_initial_selector_tags = [
+        "Internet",
+        "Best Latency",
+        "Lock Region ID",
+        "WhatsApp",
+        "GAMESMAX(ML/FF/AOV)",
+        "Route Port Game",
+        "Option ADs",
+        "Option P0rn"
+    ]
+
+    # Tambahkan selector/urltest awal sesuai urutan
+    for tag_name in desired_initial_selector_tags:
+        if tag_name in template_outbound_map:
+            head.append(template_outbound_map[tag_name])
+        else:
+            # Jika selector tidak ada di template, tambahkan placeholder default
+            if tag_name == "Internet":
+                head.append({
+                    "tag": "Internet",
+                    "type": "selector",
+                    "outbounds": ["Best Latency", "direct"] # Default awal
+                })
+            elif tag_name == "Best Latency":
+                 head.append({
+                    "type": "urltest",
+                    "tag": "Best Latency",
+                    "outbounds": [], # Akan diisi dengan akun konversi + direct
+                    "url": "https://www.gstatic.com/generate_204",
+                    "interval": "30s"
+                })
+            elif tag_name == "Lock Region ID":
+                 head.append({
+                    "type": "selector",
+                    "tag": "Lock Region ID",
+                    "outbounds": []
+                })
+            elif tag_name in EXCLUDED_SELECTOR_TAGS:
+                # Untuk tag yang dikecualikan, jika tidak di template, tambahkan dengan outbounds default
+                head.append({
+                    "type": "selector",
+                    "tag": tag_name,
+                    "outbounds": ["direct", "Internet", "Best Latency", "Lock Region ID"] # Default umum
+                })
+            logger.warning(f"Selector '{tag_name}' tidak ditemukan di template. Menambahkan placeholder default.")
+
+    # Outbounds lain dari template yang tidak termasuk dalam kategori di atas
+    current_final_outbound_tags = {o["tag"] for o in head if "tag" in o}
+
+    tail_candidates = []
+    for outbound in template_outbounds:
+        tag = outbound.get("tag")
+        if tag not in current_final_outbound_tags and tag not in existing_default_tags:
+            tail_candidates.append(outbound)
+            current_final_outbound_tags.add(tag)
+
+    # Outbounds default di bagian paling akhir, pastikan tidak duplikat
+    default_outbounds = [
+        o for o in (direct_outbound, bypass_outbound, block_outbound, dns_out_outbound)
+        if o["tag"] not in current_final_outbound_tags
+    ]
+
+    return head, tail_candidates, default_outbounds
+
+def _selector_mode(outbound_item):
+    """
+    Decides how the selector reference rewrite treats an outbound:
+    "excluded" (EXCLUDED_SELECTOR_TAGS, left untouched), "fill" (gets all converted nodes),
+    "merge" (keeps its valid references and adds the converted nodes), or None (not a selector).
+    """
+    current_selector_tag = outbound_item.get("tag")
+    if current_selector_tag in EXCLUDED_SELECTOR_TAGS:
+        return "excluded"
+    if (outbound_item.get("type") == "selector" or \
+        outbound_item.get("type") == "urltest") and \
+        "outbounds" in outbound_item and \
+        isinstance(outbound_item["outbounds"], list):
+        if current_selector_tag in ["Internet", "Best Latency", "Lock Region ID"]:
+            return "fill"
+        return "merge"
+    logger.debug("Skipping non-selector item or malformed selector: %s (Type: %s)", outbound_item.get('tag', 'No Tag'), type(outbound_item.get('type')))
+    return None
+
+def _update_selector_references(selector_items, converted_tags, all_outbound_tags):
+    """
+    Rewrites the `outbounds` list of every (outbound_item, mode) pair from the
+    selector plan so it points at the converted nodes.
+    Runs in O(total references): membership checks go through a tag set and
+    insertion-ordered dicts instead of list scans, keeping the original order.
+    Returns the number of selectors that were changed.
+    """
+    all_outbound_tag_set = set(all_outbound_tags)
+    updated_ref_count = 0
+    for outbound_item, mode in selector_items:
+        current_selector_tag = outbound_item.get("tag")
         
-        # Coba ekstrak kode negara (misal US, SG, ID) dari awal nama
-        match_country = re.match(r'^([A-Za-z]{2})\s*-\s*(.*)', display_name)
-        if match_country:
-            country_code = match_country.group(1).upper()
-            remaining_name = match_country.group(2).strip()
-            display_name = remaining_name
+        # Lewati jika ada di daftar pengecualian
+        if mode == "excluded":
+            logger.info(f"Melewati selector '{current_selector_tag}' karena ada di daftar pengecualian.")
+            continue 
+
+        original_nested_outbounds_list = list(outbound_item["outbounds"])
         
-        # Hapus bagian dalam kurung siku jika ada (misal [VLESS-TLS])
-        display_name = re.sub(r'\s*\[.*?\]\s*', '', display_name).strip()
+        # dict dipakai sebagai set yang menjaga urutan insert: cek keanggotaan O(1)
+        new_nested_outbounds = {}
 
-        # Cek apakah nama display_name sudah cukup informatif, kalau tidak, pakai original_tag_name utuh
-        # Atau jika setelah dibersihkan jadi kosong, pakai nama aslinya
-        if not display_name or display_name.lower().startswith(("vmess", "vless", "trojan", "node")):
-            display_name = original_tag_name.replace('_', ' ').strip() # Ganti underscore jadi spasi
+        # Untuk "Internet", "Best Latency", "Lock Region ID", tambahkan semua akun VPN hasil konversi
+        if mode == "fill":
+            # Tambahkan akun konversi terlebih dahulu
+            new_nested_outbounds.update(dict.fromkeys(converted_tags))
+            
+            # Lalu tambahkan "direct"
+            if "direct" not in new_nested_outbounds and "direct" in all_outbound_tag_set:
+                new_nested_outbounds["direct"] = None
 
-        emoji = get_emoji_from_country_code(country_code)
-        
-        final_tag = f"{emoji} {display_name} #{node_counter}".strip()
-        outbound["tag"] = final_tag
-        logger.debug(f"Converted link to Sing-Box outbound with formatted tag: {outbound.get('tag')}")
-        return outbound
-    return None
+            # Untuk "Internet", pastikan "Best Latency" dan "Lock Region ID" ada di awal
+            front_tags = []
+            if current_selector_tag == "Internet":
+                if "Best Latency" in all_outbound_tag_set and "Best Latency" not in new_nested_outbounds:
+                    front_tags.append("Best Latency") # Prioritaskan Best Latency
+                
+                # Cek posisi "Lock Region ID" agar tidak di depan Best Latency
+                if "Lock Region ID" in all_outbound_tag_set and "Lock Region ID" not in new_nested_outbounds:
+                    if "Best Latency" in new_nested_outbounds and not front_tags:
+                        # Best Latency sudah ada di tengah list, sisipkan tepat setelahnya (sekali jalan, O(N))
+                        new_nested_outbounds = list(new_nested_outbounds)
+                        new_nested_outbounds.insert(new_nested_outbounds.index("Best Latency") + 1, "Lock Region ID")
+                    else:
+                        front_tags.append("Lock Region ID")
+            if front_tags:
+                new_nested_outbounds = front_tags + list(new_nested_outbounds)
+            
+        else: # Untuk selector lain yang tidak dikecualikan dan bukan di atas
+            # Pertahankan outbounds asli yang masih valid
+            for original_tag_in_selector in original_nested_outbounds_list:
+                if original_tag_in_selector in all_outbound_tag_set:
+                    new_nested_outbounds.setdefault(original_tag_in_selector)
+            
+            # Tambahkan akun konversi jika belum ada
+            new_nested_outbounds.update(dict.fromkeys(converted_tags))
+
+            # Tambahkan default tags jika belum ada di selector ini
+            for default_tag_check in ["direct", "bypass", "block", "dns-out"]:
+                if default_tag_check in all_outbound_tag_set:
+                    new_nested_outbounds.setdefault(default_tag_check)
+
+        new_nested_outbounds = list(new_nested_outbounds)
+
+        # Hanya update jika ada perubahan
+        if new_nested_outbounds != original_nested_outbounds_list:
+            outbound_item["outbounds"] = new_nested_outbounds
+            updated_ref_count += 1
+            logger.debug("Updated selector '%s'. New outbounds: %s", current_selector_tag, new_nested_outbounds)
+        else:
+            logger.debug("Selector '%s' not updated (no changes).", current_selector_tag)
+
+    return updated_ref_count
+
+class CompiledTemplate:
+    """
+    A Sing-Box template parsed once and ready to splice converted outbounds into.
+    The outbound layout and the selector plan (which selectors get filled, merged or
+    skipped because of EXCLUDED_SELECTOR_TAGS, and which placeholders are added) are
+    computed at construction, so each conversion only copies the selectors it rewrites.
+    """
+
+    def __init__(self, template_content):
+        self.content_hash = hashlib.sha256(template_content.encode('utf-8')).hexdigest()
+        self.mtime_ns = None # Diisi load_compiled_template untuk template dari file
+        self._config = json.loads(template_content)
+        logger.debug("Successfully parsed config_data keys: %s", self._config.keys())
+        head, tail_candidates, default_outbounds = _plan_outbounds(self._config["outbounds"])
+        # Tiap item disimpan bersama mode selector-nya
+        self._head = [(o, _selector_mode(o)) for o in head]
+        self._tail = [(o, _selector_mode(o)) for o in tail_candidates + default_outbounds]
+
+    def instantiate(self, converted_tags):
+        """
+        Returns (config_data, head, tail, selector_items) for one conversion.
+        config_data is a shallow copy of the template whose "outbounds" must be set to
+        head + converted outbounds + tail. Selector items are fresh copies, so rewriting
+        their references never touches the compiled template.
+        """
+        converted_tag_set = set(converted_tags)
+        head = []
+        tail = []
+        selector_items = []
+        for items, target in ((self._head, head), (self._tail, tail)):
+            for outbound_item, mode in items:
+                if target is tail and outbound_item.get("tag") in converted_tag_set:
+                    continue
+                if mode in ("fill", "merge"):
+                    outbound_item = dict(outbound_item)
+                if mode is not None:
+                    selector_items.append((outbound_item, mode))
+                target.append(outbound_item)
+        return dict(self._config), head, tail, selector_items
+
+# Cache CompiledTemplate per path file, divalidasi ulang lewat mtime dan hash isi file
+_compiled_template_cache = {}
+
+def load_compiled_template(file_path="singbox-template.txt"):
+    """
+    Returns a CompiledTemplate for file_path, or None if the file doesn't exist.
+    The compiled template is reused until the file's mtime changes; a changed mtime
+    with identical content (same hash) still reuses it. Raises ValueError on invalid JSON.
+    """
+    try:
+        mtime_ns = os.stat(file_path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+    cached = _compiled_template_cache.get(file_path)
+    if cached is not None and cached.mtime_ns == mtime_ns:
+        return cached
+
+    with open(file_path, "r") as f:
+        template_content = f.read()
+    if cached is not None and cached.content_hash == hashlib.sha256(template_content.encode('utf-8')).hexdigest():
+        cached.mtime_ns = mtime_ns
+        return cached
+
+    logger.debug("Compiling Sing-Box template from %s", file_path)
+    compiled = CompiledTemplate(template_content)
+    compiled.mtime_ns = mtime_ns
+    _compiled_template_cache[file_path] = compiled
+    return compiled
+
+class ConfigSerializer:
+    """
+    JSON serializer for generated configs.
+    Pretty mode matches json.dumps(indent=2); compact mode has no whitespace at all.
+    Uses orjson when it is installed (backend "auto"), otherwise the stdlib json module.
+    Both backends emit UTF-8 text (no \\u escapes), so the bytes don't depend on which
+    backend is available.
+    """
+
+    def __init__(self, compact=False, backend="auto"):
+        if backend == "auto":
+            backend = "orjson" if orjson is not None else "json"
+        if backend == "orjson" and orjson is None:
+            raise ValueError("JSON backend 'orjson' diminta tapi package orjson belum terinstall.")
+        if backend not in ("json", "orjson"):
+            raise ValueError(f"JSON backend tidak dikenal: {backend}")
+        self.compact = compact
+        self.backend = backend
+        self.key_separator = ":" if compact else ": "
+
+    def dumps(self, value):
+        """Serializes value as a complete top-level JSON document."""
+        if self.backend == "orjson":
+            try:
+                return orjson.dumps(value, option=0 if self.compact else orjson.OPT_INDENT_2).decode('utf-8')
+            except orjson.JSONEncodeError:
+                pass # Misal integer di luar 64-bit, fallback ke stdlib
+        if self.compact:
+            return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+        return json.dumps(value, indent=2, ensure_ascii=False)
+
+    def dumps_nested(self, value, level):
+        """Serializes value as it appears `level` containers deep inside a pretty/compact document."""
+        # JSON string tidak pernah berisi newline mentah, jadi replace '\n' aman.
+        text = self.dumps(value)
+        if self.compact or not level:
+            return text
+        return text.replace('\n', '\n' + '  ' * level)
 
+    def newline(self, level):
+        """Line break + indentation before an item at `level` (empty in compact mode)."""
+        return "" if self.compact else "\n" + "  " * level
 
-def process_singbox_config(vmess_links_str, template_content, output_options=None):
+# Format kompresi output -> ekstensi file
+COMPRESSION_EXTENSIONS = {"gzip": ".gz", "zstd": ".zst"}
+COMPRESSION_MIME_TYPES = {"gzip": "application/gzip", "zstd": "application/zstd"}
+
+def available_compressions():
+    """Compression formats usable here: gzip always, zstd when the zstandard package is installed."""
+    return [name for name in COMPRESSION_EXTENSIONS if name != "zstd" or zstandard is not None]
+
+def compress_config(config_content, compression="gzip", level=None):
+    """
+    Compresses a generated config (str or bytes) with "gzip" or "zstd" and returns bytes.
+    Output is deterministic (gzip mtime is fixed at 0), so the same config always gives
+    the same bytes and an unchanged upload can be skipped by blob SHA.
+    """
+    data = config_content.encode('utf-8') if isinstance(config_content, str) else config_content
+    if compression == "gzip":
+        return gzip.compress(data, compresslevel=9 if level is None else level, mtime=0)
+    if compression == "zstd":
+        if zstandard is None:
+            raise ValueError("Kompresi 'zstd' diminta tapi package zstandard belum terinstall.")
+        return zstandard.ZstdCompressor(level=10 if level is None else level).compress(data)
+    raise ValueError(f"Format kompresi tidak dikenal: {compression}")
+
+def get_serializer(output_options=None):
+    """
+    Builds the ConfigSerializer for output_options:
+    {"compact": bool (default False), "json_backend": "auto" | "json" | "orjson"}.
+    process_singbox_config also reads {"compression": None | "gzip" | "zstd"}.
+    """
+    output_options = output_options or {}
+    return ConfigSerializer(
+        compact=output_options.get("compact", False),
+        backend=output_options.get("json_backend", "auto")
+    )
+
+def _compile_template(template_content):
+    if isinstance(template_content, CompiledTemplate):
+        return template_content
+    logger.debug("Received template_content (first 200 chars): %s", template_content[:200])
+    return CompiledTemplate(template_content)
+
+def _iter_converted(links, parallel, max_workers, cache, dedup=None, stats=None):
+    if parallel:
+        return iter_singbox_outbounds_parallel(links, max_workers=max_workers, cache=cache, dedup=dedup, stats=stats)
+    return iter_singbox_outbounds(links, cache=cache, dedup=dedup, stats=stats)
+
+def _cache_counts(cache):
+    return (cache.hits, cache.misses) if cache is not None else (0, 0)
+
+def _finish_stats(stats, result, node_index, updated_ref_count, cache, cache_counts_before):
+    # Lengkapi counter run ini, taruh di result, lalu kirim ke sink
+    stats.count("duplicates_dropped", node_index.dropped if node_index else 0)
+    stats.count("selectors_updated", updated_ref_count)
+    if cache is not None:
+        hits, misses = _cache_counts(cache)
+        stats.count("cache_hits", hits - cache_counts_before[0])
+        stats.count("cache_misses", misses - cache_counts_before[1])
+    result["stats"] = stats.as_dict()
+    stats.emit()
+    return result
+
+def _flush_cache(cache):
+    # Cache disk gagal ditulis cuma bikin run berikutnya parse ulang, konversinya sendiri tetap jalan
+    if cache is None:
+        return
+    try:
+        cache.flush()
+    except sqlite3.Error as e:
+        logger.warning(f"Cache outbound gagal ditulis: {e}")
+
+def process_singbox_config(vmess_links_str, template_content, output_options=None, parallel=False, max_workers=None, cache=None, dedup=True,
+                           stats=None):
     """
     Processes VMess/VLESS/Trojan links and integrates them into a Sing-Box configuration template.
     It puts converted outbounds based on the user's specified order.
     Excludes certain selector tags from being updated.
+    template_content may be the template JSON string or a CompiledTemplate.
+    With parallel=True, links are parsed in a process pool (see iter_singbox_outbounds_parallel).
+    An optional OutboundCache makes re-conversions only parse new or changed links.
+    output_options selects the JSON form, see get_serializer() (pretty by default,
+    {"compact": True} for machine consumers). With {"compression": "gzip"} (or "zstd")
+    the result also holds `compressed_content` (bytes, see compress_config()).
+    With dedup=True, nodes pointing at the same endpoint (see node_identity()) are
+    emitted once; the first occurrence is kept and `duplicates_dropped` reports the rest.
+    stats=True (or a ConversionStats) records wall time per stage and counters and
+    returns them as `stats` in the result dict; off by default and then costs nothing.
     """
     try:
-        logger.debug(f"Received template_content (first 200 chars): {template_content[:200]}")
-        
-        config_data = json.loads(template_content)
-        logger.debug(f"Successfully parsed config_data keys: {config_data.keys()}")
-
-        vmess_links = [link.strip() for link in vmess_links_str.split('\n') if link.strip()]
-
-        converted_outbounds = []
-        node_counter = 1
-        for link in vmess_links:
-            outbound = convert_link_to_singbox_outbound(link, node_counter)
-            if outbound:
-                converted_outbounds.append(outbound)
-                node_counter += 1
-            else:
-                logger.warning(f"Failed to convert link: {link}")
+        stats = _make_stats(stats)
+        cache_counts_before = _cache_counts(cache)
+        with _stage(stats, "total"):
+            serializer = get_serializer(output_options)
+            with _stage(stats, "template_parse"):
+                template = _compile_template(template_content)
+            node_index = NodeIndex() if dedup else None
 
-        if not converted_outbounds:
-            logger.warning("Nggak ada link VPN valid yang dikonversi. Melanjutkan dengan outbounds template dan default.")
+            converted_outbounds = list(_iter_converted(vmess_links_str, parallel, max_workers, cache, node_index, stats))
+            duplicates_dropped = node_index.dropped if node_index else 0
+            if duplicates_dropped:
+                logger.info(f"{duplicates_dropped} node duplikat dibuang.")
 
-        # Default fixed outbounds
-        direct_outbound = {"type": "direct", "tag": "direct"}
-        bypass_outbound = {"type": "direct", "tag": "bypass"}
-        block_outbound = {"type": "block", "tag": "block"}
-        dns_out_outbound = {"type": "dns", "tag": "dns-out"}
+            if not converted_outbounds:
+                logger.warning("Nggak ada link VPN valid yang dikonversi. Melanjutkan dengan outbounds template dan default.")
 
-        existing_default_tags = ["direct", "bypass", "block", "dns-out"]
-        
-        template_outbound_map = {o["tag"]: o for o in config_data["outbounds"] if "tag" in o}
-
-        final_outbounds = []
-
-        desired_initial_selector_tags = [
-            "Internet",
-            "Best Latency",
-            "Lock Region ID",
-            "WhatsApp",
-            "GAMESMAX(ML/FF/AOV)",
-            "Route Port Game",
-            "Option ADs",
-            "Option P0rn"
-        ]
+            with _stage(stats, "outbound_merge"):
+                converted_tags = [o["tag"] for o in converted_outbounds]
+                config_data, head, tail, selector_items = template.instantiate(converted_tags)
 
-        # Tambahkan selector/urltest awal sesuai urutan
-        for tag_name in desired_initial_selector_tags:
-            if tag_name in template_outbound_map:
-                final_outbounds.append(template_outbound_map[tag_name])
-            else:
-                # Jika selector tidak ada di template, tambahkan placeholder default
-                if tag_name == "Internet":
-                    final_outbounds.append({
-                        "tag": "Internet",
-                        "type": "selector",
-                        "outbounds": ["Best Latency", "direct"] # Default awal
-                    })
-                elif tag_name == "Best Latency":
-                     final_outbounds.append({
-                        "type": "urltest",
-                        "tag": "Best Latency",
-                        "outbounds": [], # Akan diisi dengan akun konversi + direct
-                        "url": "https://www.gstatic.com/generate_204",
-                        "interval": "30s"
-                    })
-                elif tag_name == "Lock Region ID":
-                     final_outbounds.append({
-                        "type": "selector",
-                        "tag": "Lock Region ID",
-                        "outbounds": []
-                    })
-                elif tag_name in EXCLUDED_SELECTOR_TAGS:
-                    # Untuk tag yang dikecualikan, jika tidak di template, tambahkan dengan outbounds default
-                    final_outbounds.append({
-                        "type": "selector",
-                        "tag": tag_name,
-                        "outbounds": ["direct", "Internet", "Best Latency", "Lock Region ID"] # Default umum
-                    })
-                logger.warning(f"Selector '{tag_name}' tidak ditemukan di template. Menambahkan placeholder default.")
-
-        # Tambahkan akun hasil konversi
-        final_outbounds.extend(converted_outbounds)
-
-        # Tambahkan outbounds lain dari template yang tidak termasuk dalam kategori di atas
-        # dan belum ditambahkan ke final_outbounds.
-        current_final_outbound_tags = {o["tag"] for o in final_outbounds if "tag" in o}
-        
-        for outbound in config_data["outbounds"]:
-            tag = outbound.get("tag")
-            if tag not in current_final_outbound_tags and tag not in existing_default_tags:
-                final_outbounds.append(outbound)
-                current_final_outbound_tags.add(tag) 
-
-        # Tambahkan outbounds default di bagian paling akhir, pastikan tidak duplikat
-        if direct_outbound["tag"] not in current_final_outbound_tags: final_outbounds.append(direct_outbound)
-        if bypass_outbound["tag"] not in current_final_outbound_tags: final_outbounds.append(bypass_outbound)
-        if block_outbound["tag"] not in current_final_outbound_tags: final_outbounds.append(block_outbound)
-        if dns_out_outbound["tag"] not in current_final_outbound_tags: final_outbounds.append(dns_out_outbound)
-        
-        config_data["outbounds"] = final_outbounds
+                # Tambahkan akun hasil konversi di antara selector awal dan outbounds lainnya
+                final_outbounds = head + converted_outbounds + tail
+                config_data["outbounds"] = final_outbounds
 
-        # --- UPDATE REFERENSI UNTUK SELECTOR/URLTEST (DENGAN PENGECUALIAN) ---
-        all_outbound_tags = [o["tag"] for o in final_outbounds if "tag" in o]
-        logger.debug(f"All available outbound tags after reordering: {all_outbound_tags}")
+            # --- UPDATE REFERENSI UNTUK SELECTOR/URLTEST (DENGAN PENGECUALIAN) ---
+            with _stage(stats, "selector_rewrite"):
+                all_outbound_tags = [o["tag"] for o in final_outbounds if "tag" in o]
+                logger.debug("All available outbound tags after reordering: %s", all_outbound_tags)
 
-        updated_ref_count = 0
-        for outbound_item in config_data["outbounds"]:
-            current_selector_tag = outbound_item.get("tag")
-            
-            # Lewati jika ada di daftar pengecualian
-            if current_selector_tag in EXCLUDED_SELECTOR_TAGS:
-                logger.info(f"Melewati selector '{current_selector_tag}' karena ada di daftar pengecualian.")
-                continue 
-
-            if (outbound_item.get("type") == "selector" or \
-                outbound_item.get("type") == "urltest") and \
-                "outbounds" in outbound_item and \
-                isinstance(outbound_item["outbounds"], list):
-                
-                original_nested_outbounds_list = list(outbound_item["outbounds"])
-                
-                new_nested_outbounds = []
-
-                # Untuk "Internet", "Best Latency", "Lock Region ID", tambahkan semua akun VPN hasil konversi
-                if current_selector_tag in ["Internet", "Best Latency", "Lock Region ID"]:
-                    # Tambahkan akun konversi terlebih dahulu
-                    for converted_o in converted_outbounds:
-                        if converted_o["tag"] not in new_nested_outbounds:
-                            new_nested_outbounds.append(converted_o["tag"])
-                    
-                    # Lalu tambahkan "direct"
-                    if "direct" not in new_nested_outbounds and "direct" in all_outbound_tags:
-                        new_nested_outbounds.append("direct")
-
-                    # Untuk "Internet", pastikan "Best Latency" dan "Lock Region ID" ada di awal
-                    if current_selector_tag == "Internet":
-                        if "Best Latency" in all_outbound_tags and "Best Latency" not in new_nested_outbounds:
-                            new_nested_outbounds.insert(0, "Best Latency") # Prioritaskan Best Latency
-                        
-                        # Cek posisi "Lock Region ID" agar tidak di depan Best Latency
-                        if "Lock Region ID" in all_outbound_tags and "Lock Region ID" not in new_nested_outbounds:
-                            insert_index = 0
-                            if "Best Latency" in new_nested_outbounds:
-                                insert_index = new_nested_outbounds.index("Best Latency") + 1
-                            new_nested_outbounds.insert(insert_index, "Lock Region ID")
-                    
-                else: # Untuk selector lain yang tidak dikecualikan dan bukan di atas
-                    # Pertahankan outbounds asli yang masih valid
-                    for original_tag_in_selector in original_nested_outbounds_list:
-                        if original_tag_in_selector in all_outbound_tags and original_tag_in_selector not in new_nested_outbounds:
-                            new_nested_outbounds.append(original_tag_in_selector)
-                    
-                    # Tambahkan akun konversi jika belum ada
-                    for converted_o in converted_outbounds:
-                        if converted_o["tag"] not in new_nested_outbounds:
-                            new_nested_outbounds.append(converted_o["tag"])
-
-                    # Tambahkan default tags jika belum ada di selector ini
-                    for default_tag_check in ["direct", "bypass", "block", "dns-out"]:
-                        if default_tag_check not in new_nested_outbounds and default_tag_check in all_outbound_tags:
-                            new_nested_outbounds.append(default_tag_check)
-
-                # Hanya update jika ada perubahan
-                if new_nested_outbounds != original_nested_outbounds_list:
-                    outbound_item["outbounds"] = new_nested_outbounds
-                    updated_ref_count += 1
-                    logger.debug(f"Updated selector '{current_selector_tag}'. New outbounds: {new_nested_outbounds}")
-                else:
-                    logger.debug(f"Selector '{current_selector_tag}' not updated (no changes).")
-            else:
-                logger.debug(f"Skipping non-selector item or malformed selector: {outbound_item.get('tag', 'No Tag')} (Type: {type(outbound_item.get('type'))})")
+                updated_ref_count = _update_selector_references(selector_items, converted_tags, all_outbound_tags)
 
+            logger.info(f"{updated_ref_count} selector/urltest outbounds berhasil diperbarui referensinya.")
 
-        logger.info(f"{updated_ref_count} selector/urltest outbounds berhasil diperbarui referensinya.")
+            with _stage(stats, "dump"):
+                new_config_content = serializer.dumps(config_data)
 
-        new_config_content = json.dumps(config_data, indent=2)
+            compression = (output_options or {}).get("compression")
+            if compression:
+                with _stage(stats, "compress"):
+                    compressed_content = compress_config(new_config_content, compression)
         
-        return {
+        result = {
             "status": "success", 
             "message": "Konfigurasi Sing-Box baru sudah dibuat.",
             "config_content": new_config_content, 
+            "duplicates_dropped": duplicates_dropped,
+        }
+        if compression:
+            result["compression"] = compression
+            result["compressed_content"] = compressed_content
+        if stats is not None:
+            _finish_stats(stats, result, node_index, updated_ref_count, cache, cache_counts_before)
+        return result
+
+    except Exception as e:
+        logger.error(f"Error during Sing-Box conversion: {e}", exc_info=True)
+        return {"status": "error", "message": f"Terjadi error yang nggak terduga saat konversi Sing-Box: {e}"}
+    finally:
+        _flush_cache(cache)
+
+def write_singbox_config(links, template_content, sink, output_options=None, parallel=False, max_workers=None, cache=None, dedup=True,
+                         stats=None):
+    """
+    Streaming variant of process_singbox_config.
+    Links are read lazily from `links` (string, file object or iterable of lines),
+    converted outbounds are spooled to a temporary file as they are produced, and the
+    final config is written to the file-like `sink` piece by piece.
+    Only the node tags are kept in memory, so peak memory stays roughly flat
+    regardless of the number of links. Output is identical to process_singbox_config.
+    template_content may be the template JSON string or a CompiledTemplate.
+    `sink` can be any text file-like object, e.g. an open file or socket.makefile("w").
+    output_options, dedup and stats work as in process_singbox_config; spool writes
+    are not timed separately, they only show up in the "total" stage.
+    Returns a result dict without `config_content`.
+    """
+    try:
+        stats = _make_stats(stats)
+        cache_counts_before = _cache_counts(cache)
+        serializer = get_serializer(output_options)
+        node_index = NodeIndex() if dedup else None
+
+        converted_tags = []
+        with _stage(stats, "total"), \
+             tempfile.SpooledTemporaryFile(max_size=STREAM_SPOOL_MAX_SIZE, mode="w+", encoding="utf-8") as spool:
+            with _stage(stats, "template_parse"):
+                template = _compile_template(template_content)
+
+            # Outbound hasil konversi langsung ditulis ke spool dalam format akhirnya
+            item_separator = "," + serializer.newline(2)
+            for outbound in _iter_converted(links, parallel, max_workers, cache, node_index, stats):
+                if converted_tags:
+                    spool.write(item_separator)
+                spool.write(serializer.dumps_nested(outbound, 2))
+                converted_tags.append(outbound["tag"])
+
+            if not converted_tags:
+                logger.warning("Nggak ada link VPN valid yang dikonversi. Melanjutkan dengan outbounds template dan default.")
+            if node_index and node_index.dropped:
+                logger.info(f"{node_index.dropped} node duplikat dibuang.")
+
+            with _stage(stats, "outbound_merge"):
+                config_data, head, tail, selector_items = template.instantiate(converted_tags)
+            with _stage(stats, "selector_rewrite"):
+                all_outbound_tags = [o["tag"] for o in head if "tag" in o]
+                all_outbound_tags += converted_tags
+                all_outbound_tags += [o["tag"] for o in tail if "tag" in o]
+                updated_ref_count = _update_selector_references(selector_items, converted_tags, all_outbound_tags)
+            logger.info(f"{updated_ref_count} selector/urltest outbounds berhasil diperbarui referensinya.")
+
+            with _stage(stats, "dump"):
+                sink.write("{")
+                for index, (key, value) in enumerate(config_data.items()):
+                    sink.write(("," if index else "") + serializer.newline(1))
+                    sink.write(serializer.dumps(key) + serializer.key_separator)
+                    if key != "outbounds":
+                        sink.write(serializer.dumps_nested(value, 1))
+                        continue
+
+                    # head selalu berisi selector awal, jadi array outbounds tidak pernah kosong
+                    sink.write("[" + serializer.newline(2))
+                    sink.write(item_separator.join(serializer.dumps_nested(o, 2) for o in head))
+                    if converted_tags:
+                        sink.write(item_separator)
+                        spool.seek(0)
+                        shutil.copyfileobj(spool, sink)
+                    for outbound in tail:
+                        sink.write(item_separator + serializer.dumps_nested(outbound, 2))
+                    sink.write(serializer.newline(1) + "]")
+                sink.write(serializer.newline(0) + "}")
+
+        result = {
+            "status": "success",
+            "message": "Konfigurasi Sing-Box baru sudah dibuat.",
+            "converted_count": len(converted_tags),
+            "duplicates_dropped": node_index.dropped if node_index else 0,
         }
+        if stats is not None:
+            _finish_stats(stats, result, node_index, updated_ref_count, cache, cache_counts_before)
+        return result
 
     except Exception as e:
         logger.error(f"Error during Sing-Box conversion: {e}", exc_info=True)
         return {"status": "error", "message": f"Terjadi error yang nggak terduga saat konversi Sing-Box: {e}"}
+    finally:
+        _flush_cache(cache)
+
+# --- Ringkasan config hasil konversi ---
+# Kebalikan COUNTRY_EMOJIS, buat membaca region dari emoji di awal tag
+_EMOJI_COUNTRIES = {emoji: code for code, emoji in COUNTRY_EMOJIS.items()}
+SUMMARY_SAMPLE_SIZE = 5
+
+def _outbound_region(tag):
+    emoji = tag.split(" ", 1)[0]
+    code = _EMOJI_COUNTRIES.get(emoji)
+    return f"{emoji} {code}" if code else "🌎 Lainnya"
+
+def summarize_config(config_content, sample_size=SUMMARY_SAMPLE_SIZE):
+    """
+    Small summary of a generated config, for showing instead of the whole JSON:
+    converted node counts per protocol and per region (from the tag's country emoji),
+    the first `sample_size` converted outbounds, and the member count of every
+    selector/urltest. config_content may be the JSON string or the parsed dict.
+    """
+    config = json.loads(config_content) if isinstance(config_content, str) else config_content
+    outbounds = config.get("outbounds", [])
+    protocols = collections.Counter()
+    regions = collections.Counter()
+    sample = []
+    selectors = {}
+    for outbound in outbounds:
+        outbound_type = outbound.get("type")
+        if outbound_type in LINK_PARSERS:
+            protocols[outbound_type] += 1
+            regions[_outbound_region(outbound.get("tag", ""))] += 1
+            if len(sample) < sample_size:
+                sample.append(outbound)
+        elif outbound_type in ("selector", "urltest"):
+            selectors[outbound.get("tag", "")] = len(outbound.get("outbounds", []))
+    return {
+        "outbound_count": len(outbounds),
+        "node_count": sum(protocols.values()),
+        "protocols": dict(protocols.most_common()),
+        "regions": dict(regions.most_common()),
+        "selectors": selectors,
+        "sample": sample,
+    }
+
+# --- CLI ---
+def _read_links_input(path, use_mmap=False, subscription=None):
+    """
+    Opens the CLI link input and returns (links, close).
+    `links` is anything iter_links() accepts; close() releases the file or mmap afterwards.
+    Plain link lists are streamed line by line; base64 subscription blobs are decoded in
+    chunks by iter_subscription_file() (with --mmap, the mapping goes through
+    decode_subscription() in one pass). Files may also be gzip-compressed (not with --mmap).
+    subscription=None guesses the format from the first bytes.
+    """
+    if path in (None, "-"):
+        stream = sys.stdin.buffer
+        head = stream.peek(_SNIFF_SIZE)[:_SNIFF_SIZE] if hasattr(stream, "peek") else b""
+        if subscription or (subscription is None and _looks_like_subscription_blob(head)):
+            return iter_subscription_file(stream), lambda: None
+        return stream, lambda: None
+
+    f = open(path, "rb")
+    if use_mmap and os.fstat(f.fileno()).st_size > 0:
+        import mmap
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        def close():
+            mapped.close()
+            f.close()
+        if subscription or (subscription is None and _looks_like_subscription_blob(mapped[:_SNIFF_SIZE])):
+            with memoryview(mapped) as view:
+                links = decode_subscription(view)
+            close()
+            return links, lambda: None
+        return iter(mapped.readline, b""), close
+
+    return read_links_file(f, subscription), f.close
+
+def _open_output(path):
+    """
+    Returns (sink, commit, abort) for the CLI output. A file is written to a temp file
+    next to it and renamed on commit, so a failed run never leaves a half-written config.
+    """
+    if path in (None, "-"):
+        return sys.stdout, sys.stdout.flush, lambda: None
+    tmp = tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=os.path.dirname(os.path.abspath(path)),
+                                      prefix=".singbox-", suffix=".tmp", delete=False)
+
+    def commit():
+        tmp.close()
+        os.replace(tmp.name, path)
+
+    def abort():
+        tmp.close()
+        os.unlink(tmp.name)
+    return tmp, commit, abort
+
+def main(argv=None):
+    """
+    Headless converter for cron jobs and CI: reads links, applies the template and
+    writes the Sing-Box config. Imports nothing beyond this module.
+        python -m singbox_converter -t singbox-template.txt < links.txt > config.json
+        python -m singbox_converter -i links.txt --mmap -o config.json --compact
+        python -m singbox_converter -i links.txt -o config.json --cache-db outbound-cache.sqlite
+    Returns the process exit code.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="python -m singbox_converter",
+        description="Konversi link VMess/VLESS/Trojan (atau blob subscription base64) ke config Sing-Box."
+    )
+    parser.add_argument("-i", "--input", default="-", help="File berisi link, '-' untuk stdin (default)")
+    parser.add_argument("-t", "--template", default="singbox-template.txt", help="Path template Sing-Box (default singbox-template.txt)")
+    parser.add_argument("-o", "--output", default="-", help="File output, '-' untuk stdout (default)")
+    parser.add_argument("--mmap", action="store_true", help="Memory-map file input (buat file link yang besar)")
+    format_group = parser.add_mutually_exclusive_group()
+    format_group.add_argument("--subscription", dest="subscription", action="store_const", const=True,
+                              help="Paksa input dibaca sebagai blob base64 subscription")
+    format_group.add_argument("--plain", dest="subscription", action="store_const", const=False,
+                              help="Paksa input dibaca sebagai list link biasa")
+    parser.add_argument("--compact", action="store_true", help="Output JSON compact (tanpa indentasi)")
+    parser.add_argument("--parallel", action="store_true", help="Parse link di process pool")
+    parser.add_argument("--workers", type=int, default=None, help="Jumlah worker untuk --parallel")
+    parser.add_argument("--no-dedup", action="store_true", help="Jangan buang node duplikat")
+    parser.add_argument("--cache-db", help="File SQLite cache outbound: run berikutnya cuma parse link yang baru/berubah")
+    parser.add_argument("--stats", action="store_true", help="Tulis statistik per stage ke stderr (JSON)")
+    parser.add_argument("-v", "--verbose", action="count", default=0, help="Log lebih detail ke stderr (-vv untuk debug)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=(logging.WARNING, logging.INFO, logging.DEBUG)[min(args.verbose, 2)],
+        format="%(levelname)s %(message)s", stream=sys.stderr
+    )
+
+    try:
+        template = load_compiled_template(args.template)
+    except ValueError as e:
+        print(f"Template {args.template} bukan JSON yang valid: {e}", file=sys.stderr)
+        return 2
+    if template is None:
+        print(f"Template {args.template} nggak ditemukan.", file=sys.stderr)
+        return 2
+
+    try:
+        links, close_input = _read_links_input(args.input, args.mmap, args.subscription)
+    except OSError as e:
+        print(f"Gagal membuka input {args.input}: {e}", file=sys.stderr)
+        return 2
+    try:
+        sink, commit, abort = _open_output(args.output)
+    except OSError as e:
+        close_input()
+        print(f"Gagal membuka output {args.output}: {e}", file=sys.stderr)
+        return 2
+
+    try:
+        cache = OutboundCache(path=args.cache_db) if args.cache_db else None
+    except sqlite3.Error as e:
+        close_input()
+        abort()
+        print(f"Gagal membuka cache {args.cache_db}: {e}", file=sys.stderr)
+        return 2
+    try:
+        result = write_singbox_config(
+            links, template, sink,
+            output_options={"compact": args.compact},
+            parallel=args.parallel, max_workers=args.workers, cache=cache,
+            dedup=not args.no_dedup, stats=args.stats
+        )
+    finally:
+        close_input()
+        if cache is not None:
+            cache.close()
+
+    if result["status"] != "success":
+        abort()
+        print(result["message"], file=sys.stderr)
+        return 1
+    sink.write("\n")
+    commit()
+    logger.info(f"{result['converted_count']} node dikonversi, {result['duplicates_dropped']} duplikat dibuang.")
+    if args.stats:
+        print(json.dumps(result["stats"], indent=2), file=sys.stderr)
+    return 0
 
 if __name__ == '__main__':
-    print("Mek, file ini adalah modul logika Sing-Box. Jalankan 'app.py' untuk UI-nya ya.")
-            
+    sys.exit(main())
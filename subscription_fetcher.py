@@ -0,0 +1,240 @@
+import collections
+import concurrent.futures
+import http.client
+import ipaddress
+import logging
+import threading
+import urllib.parse
+import zlib
+
+import singbox_converter
+import ttl_cache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = 15
+DEFAULT_MAX_WORKERS = 8
+# Koneksi keep-alive idle maksimal yang disimpan per host
+MAX_IDLE_CONNECTIONS_PER_HOST = 4
+MAX_REDIRECTS = 5
+# Body subscription (setelah gzip di-decompress) maksimal sekian byte; lebih dari itu ditolak
+DEFAULT_MAX_BODY_BYTES = 32 * 1024 * 1024
+# Body dibaca per chunk supaya batas di atas dicek sebelum semuanya masuk memori
+READ_CHUNK_SIZE = 64 * 1024
+USER_AGENT = "SwissArmyVPNTools/1.0"
+# Validator (ETag/Last-Modified) + link hasil decode per URL: disimpan sekian detik, maksimal sekian URL
+VALIDATOR_TTL = 6 * 3600
+VALIDATOR_MAX_ENTRIES = 256
+
+class BlockedAddressError(ValueError):
+    """Raised when a subscription URL (or a redirect) points at a non-public address."""
+
+def _check_public_peer(sock):
+    # Dicek dari alamat yang benar-benar tersambung, jadi DNS rebinding dan redirect ikut tertangkap
+    address = ipaddress.ip_address(sock.getpeername()[0])
+    if address.version == 6 and address.ipv4_mapped:
+        address = address.ipv4_mapped
+    if not address.is_global:
+        raise BlockedAddressError(f"Alamat {address} bukan alamat publik, subscription ditolak.")
+
+class ResponseTooLargeError(ValueError):
+    """Raised when a subscription response (or its decompressed body) exceeds max_body_bytes."""
+
+def _read_body(response, max_body_bytes):
+    # Content-Length dicek duluan; tanpa header itu body dibaca per chunk sampai batas
+    length = response.getheader("Content-Length")
+    if length and length.isdigit() and int(length) > max_body_bytes:
+        raise ResponseTooLargeError(f"Response {int(length):,} byte, melebihi batas {max_body_bytes:,} byte.")
+    chunks = []
+    size = 0
+    while True:
+        chunk = response.read(READ_CHUNK_SIZE)
+        if not chunk:
+            return b"".join(chunks)
+        size += len(chunk)
+        if size > max_body_bytes:
+            raise ResponseTooLargeError(f"Response melebihi batas {max_body_bytes:,} byte.")
+        chunks.append(chunk)
+
+def _gunzip(body, max_body_bytes):
+    # Output decompress dibatasi, jadi gzip bomb kecil nggak bisa menghabiskan memori
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    data = decompressor.decompress(body, max_body_bytes + 1)
+    if len(data) > max_body_bytes or decompressor.unconsumed_tail:
+        raise ResponseTooLargeError(f"Body gzip setelah decompress melebihi batas {max_body_bytes:,} byte.")
+    return data
+
+class _PublicHTTPConnection(http.client.HTTPConnection):
+    def connect(self):
+        super().connect()
+        try:
+            _check_public_peer(self.sock)
+        except BlockedAddressError:
+            self.close()
+            raise
+
+class _PublicHTTPSConnection(http.client.HTTPSConnection):
+    def connect(self):
+        super().connect()
+        try:
+            _check_public_peer(self.sock)
+        except BlockedAddressError:
+            self.close()
+            raise
+
+class ConnectionPool:
+    """
+    Thread-safe pool of keep-alive http.client connections, keyed by (scheme, host, port).
+    Idle connections are reused across requests; at most `max_idle_per_host` are kept per host.
+    Unless allow_private_hosts is set, a connection whose peer is not a public address
+    (private, loopback, link-local, reserved...) is closed before any request is sent.
+    """
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, max_idle_per_host=MAX_IDLE_CONNECTIONS_PER_HOST, allow_private_hosts=False):
+        self.timeout = timeout
+        self.max_idle_per_host = max_idle_per_host
+        self.allow_private_hosts = allow_private_hosts
+        self._idle = collections.defaultdict(list)
+        self._lock = threading.Lock()
+
+    def acquire(self, scheme, host, port):
+        """Returns (connection, reused) for the host, reusing an idle connection when there is one."""
+        with self._lock:
+            idle = self._idle.get((scheme, host, port))
+            if idle:
+                return idle.pop(), True
+        if self.allow_private_hosts:
+            connection_class = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        else:
+            connection_class = _PublicHTTPSConnection if scheme == "https" else _PublicHTTPConnection
+        return connection_class(host, port, timeout=self.timeout), False
+
+    def release(self, scheme, host, port, connection):
+        with self._lock:
+            idle = self._idle[(scheme, host, port)]
+            if len(idle) < self.max_idle_per_host:
+                idle.append(connection)
+                return
+        connection.close()
+
+    def close(self):
+        with self._lock:
+            for idle in self._idle.values():
+                for connection in idle:
+                    connection.close()
+            self._idle.clear()
+
+class SubscriptionFetcher:
+    """
+    Fetches many subscription URLs concurrently over pooled keep-alive connections.
+    The ETag/Last-Modified validators and decoded links of every URL are remembered,
+    so an unchanged subscription costs a 304 instead of a full download and re-decode.
+    That memory is bounded: VALIDATOR_MAX_ENTRIES URLs, each kept VALIDATOR_TTL seconds.
+    URLs come from users and are fetched by the server, so by default only public
+    addresses may be reached (also after redirects); allow_private_hosts=True turns
+    that off, e.g. for a trusted intranet deployment. Bodies larger than
+    max_body_bytes (before or after gzip decompression) are rejected.
+    """
+
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS, timeout=DEFAULT_TIMEOUT, allow_private_hosts=False,
+                 validator_ttl=VALIDATOR_TTL, validator_max_entries=VALIDATOR_MAX_ENTRIES,
+                 max_body_bytes=DEFAULT_MAX_BODY_BYTES):
+        self.max_workers = max_workers
+        self.max_body_bytes = max_body_bytes
+        self.pool = ConnectionPool(timeout=timeout, allow_private_hosts=allow_private_hosts)
+        # url -> {"etag": ..., "last_modified": ..., "links": [...]}
+        self._validators = ttl_cache.TTLCache(ttl=validator_ttl, max_entries=validator_max_entries)
+
+    def close(self):
+        self.pool.close()
+
+    def _request(self, url, headers):
+        """
+        Performs a GET on a pooled connection, following redirects.
+        Returns (status, response headers, body bytes).
+        """
+        for _ in range(MAX_REDIRECTS + 1):
+            parsed = urllib.parse.urlsplit(url)
+            if parsed.scheme not in ("http", "https") or not parsed.hostname:
+                raise ValueError(f"URL subscription tidak valid: {url}")
+            port = parsed.port or (443 if parsed.scheme == "https" else 80)
+            target = parsed.path or "/"
+            if parsed.query:
+                target += "?" + parsed.query
+            host_header = parsed.netloc.rpartition('@')[2]
+
+            # Koneksi idle dari pool bisa saja sudah ditutup server; coba sekali lagi dengan koneksi baru
+            for attempt in range(2):
+                connection, reused = self.pool.acquire(parsed.scheme, parsed.hostname, port)
+                try:
+                    connection.request("GET", target, headers={**headers, "Host": host_header})
+                    response = connection.getresponse()
+                    body = _read_body(response, self.max_body_bytes)
+                except ResponseTooLargeError:
+                    connection.close() # Sisa body belum dibaca, koneksinya nggak bisa dipakai lagi
+                    raise
+                except (http.client.HTTPException, OSError):
+                    connection.close()
+                    if reused and attempt == 0:
+                        continue
+                    raise
+                if response.will_close:
+                    connection.close()
+                else:
+                    self.pool.release(parsed.scheme, parsed.hostname, port, connection)
+                break
+
+            if response.status in (301, 302, 303, 307, 308) and response.getheader("Location"):
+                url = urllib.parse.urljoin(url, response.getheader("Location"))
+                continue
+            if response.getheader("Content-Encoding", "").lower() == "gzip":
+                body = _gunzip(body, self.max_body_bytes)
+            return response.status, response, body
+        raise ValueError(f"Terlalu banyak redirect untuk {url}")
+
+    def fetch(self, url):
+        """
+        Fetches one subscription URL.
+        Returns a result dict: {"url", "status": "success" | "not_modified" | "error", "links", "message"}.
+        """
+        cached = self._validators.get(url)
+        headers = {"User-Agent": USER_AGENT, "Accept-Encoding": "gzip", "Connection": "keep-alive"}
+        if cached:
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        try:
+            status, response, body = self._request(url, headers)
+        except Exception as e:
+            logger.error(f"Gagal fetch subscription {url}: {e}")
+            return {"url": url, "status": "error", "links": [], "message": f"Gagal fetch subscription: {e}"}
+
+        if status == 304 and cached:
+            logger.debug(f"Subscription {url} tidak berubah (304).")
+            self._validators.put(url, cached) # Masih dipakai: TTL-nya diperpanjang
+            return {"url": url, "status": "not_modified", "links": cached["links"], "message": "Subscription tidak berubah."}
+        if status != 200:
+            return {"url": url, "status": "error", "links": [], "message": f"HTTP {status} dari server subscription."}
+
+        links = singbox_converter.decode_subscription(body)
+        etag = response.getheader("ETag")
+        last_modified = response.getheader("Last-Modified")
+        if etag or last_modified:
+            self._validators.put(url, {"etag": etag, "last_modified": last_modified, "links": links})
+        logger.info(f"Subscription {url}: {len(links)} link.")
+        return {"url": url, "status": "success", "links": links, "message": f"{len(links)} link berhasil diambil."}
+
+    def fetch_all(self, urls):
+        """Fetches all URLs concurrently. Results are returned in the same order as `urls`."""
+        urls = [url.strip() for url in urls if url and url.strip()]
+        if not urls:
+            return []
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(self.max_workers, len(urls))) as executor:
+            return list(executor.map(self.fetch, urls))
+
+def iter_subscription_links(results):
+    """Yields the links of fetch_all() results in URL order, ready for process_singbox_config."""
+    for result in results:
+        yield from result["links"]
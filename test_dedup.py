@@ -0,0 +1,44 @@
+"""
+Regression test for duplicate-node removal (NodeIndex / node_identity): a link whose
+VMess JSON decodes to list or dict values must fail or pass on its own, never break
+the whole conversion.
+"""
+import base64
+import json
+import os
+
+import singbox_converter
+
+TEMPLATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "singbox-template.txt")
+
+def _vmess(**overrides):
+    payload = {"v": "2", "ps": "US - Node", "add": "10.0.0.1", "port": "443",
+               "id": "12345678-1234-1234-1234-123456789012", "net": "ws", "path": "/ws"}
+    payload.update(overrides)
+    return "vmess://" + base64.b64encode(json.dumps(payload).encode()).decode()
+
+def _converted_tags(result):
+    outbounds = json.loads(result["config_content"])["outbounds"]
+    return [o["tag"] for o in outbounds if o.get("type") == "vmess"]
+
+def test_unhashable_identity_values_do_not_fail_the_batch():
+    with open(TEMPLATE_PATH, encoding="utf-8") as f:
+        template = f.read()
+    links = "\n".join([
+        _vmess(ps="US - Plain"),
+        _vmess(ps="US - List id", id=["a", "b"]),
+        _vmess(ps="US - Dict path", path={"p": "/x"}),
+        _vmess(ps="US - Dict path again", path={"p": "/x"}),
+    ])
+    with_dedup = singbox_converter.process_singbox_config(links, template, dedup=True)
+    without_dedup = singbox_converter.process_singbox_config(links, template, dedup=False)
+    assert with_dedup["status"] == without_dedup["status"] == "success"
+    assert len(_converted_tags(without_dedup)) == 4
+    # Node dengan path dict yang sama persis tetap dianggap duplikat
+    assert len(_converted_tags(with_dedup)) == 3
+    assert with_dedup["duplicates_dropped"] == 1
+
+def test_node_identity_is_hashable():
+    outbound = {"type": "vmess", "server": "10.0.0.1", "server_port": 443, "uuid": ["a"],
+                "transport": {"type": "ws", "path": {"p": 1}, "headers": {"Host": ["h"]}}}
+    hash(singbox_converter.node_identity(outbound))
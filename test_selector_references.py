@@ -0,0 +1,161 @@
+"""
+Regression test for the selector/urltest reference rewrite in process_singbox_config.
+The output must keep exactly the outbound and selector member order of the original
+list-scan implementation, which is frozen below as _baseline_outbounds().
+"""
+import base64
+import copy
+import json
+import os
+
+import pytest
+
+import singbox_converter
+
+TEMPLATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "singbox-template.txt")
+CONVERTED_TYPES = ("vmess", "vless", "trojan")
+
+def _baseline_outbounds(template_outbounds, converted_outbounds):
+    """Frozen copy of the original outbound layout + selector rewrite (before the linear-time rewrite)."""
+    existing_default_tags = ["direct", "bypass", "block", "dns-out"]
+    template_outbound_map = {o["tag"]: o for o in template_outbounds if "tag" in o}
+    final_outbounds = []
+    for tag_name in ["Internet", "Best Latency", "Lock Region ID", "WhatsApp", "GAMESMAX(ML/FF/AOV)",
+                     "Route Port Game", "Option ADs", "Option P0rn"]:
+        if tag_name in template_outbound_map:
+            final_outbounds.append(template_outbound_map[tag_name])
+        elif tag_name == "Internet":
+            final_outbounds.append({"tag": "Internet", "type": "selector", "outbounds": ["Best Latency", "direct"]})
+        elif tag_name == "Best Latency":
+            final_outbounds.append({"type": "urltest", "tag": "Best Latency", "outbounds": [],
+                                    "url": "https://www.gstatic.com/generate_204", "interval": "30s"})
+        elif tag_name == "Lock Region ID":
+            final_outbounds.append({"type": "selector", "tag": "Lock Region ID", "outbounds": []})
+        elif tag_name in singbox_converter.EXCLUDED_SELECTOR_TAGS:
+            final_outbounds.append({"type": "selector", "tag": tag_name,
+                                    "outbounds": ["direct", "Internet", "Best Latency", "Lock Region ID"]})
+    final_outbounds.extend(converted_outbounds)
+    current_final_outbound_tags = {o["tag"] for o in final_outbounds if "tag" in o}
+    for outbound in template_outbounds:
+        tag = outbound.get("tag")
+        if tag not in current_final_outbound_tags and tag not in existing_default_tags:
+            final_outbounds.append(outbound)
+            current_final_outbound_tags.add(tag)
+    for default_outbound in ({"type": "direct", "tag": "direct"}, {"type": "direct", "tag": "bypass"},
+                             {"type": "block", "tag": "block"}, {"type": "dns", "tag": "dns-out"}):
+        if default_outbound["tag"] not in current_final_outbound_tags:
+            final_outbounds.append(default_outbound)
+
+    all_outbound_tags = [o["tag"] for o in final_outbounds if "tag" in o]
+    for outbound_item in final_outbounds:
+        current_selector_tag = outbound_item.get("tag")
+        if current_selector_tag in singbox_converter.EXCLUDED_SELECTOR_TAGS:
+            continue
+        if outbound_item.get("type") not in ("selector", "urltest") or not isinstance(outbound_item.get("outbounds"), list):
+            continue
+        original = list(outbound_item["outbounds"])
+        new = []
+        if current_selector_tag in ["Internet", "Best Latency", "Lock Region ID"]:
+            for converted_o in converted_outbounds:
+                if converted_o["tag"] not in new:
+                    new.append(converted_o["tag"])
+            if "direct" not in new and "direct" in all_outbound_tags:
+                new.append("direct")
+            if current_selector_tag == "Internet":
+                if "Best Latency" in all_outbound_tags and "Best Latency" not in new:
+                    new.insert(0, "Best Latency")
+                if "Lock Region ID" in all_outbound_tags and "Lock Region ID" not in new:
+                    insert_index = 0
+                    if "Best Latency" in new:
+                        insert_index = new.index("Best Latency") + 1
+                    new.insert(insert_index, "Lock Region ID")
+        else:
+            for tag in original:
+                if tag in all_outbound_tags and tag not in new:
+                    new.append(tag)
+            for converted_o in converted_outbounds:
+                if converted_o["tag"] not in new:
+                    new.append(converted_o["tag"])
+            for default_tag in ["direct", "bypass", "block", "dns-out"]:
+                if default_tag not in new and default_tag in all_outbound_tags:
+                    new.append(default_tag)
+        if new != original:
+            outbound_item["outbounds"] = new
+    return final_outbounds
+
+def _links(count):
+    links = []
+    for i in range(count):
+        kind = i % 3
+        if kind == 0:
+            payload = {"v": "2", "ps": f"US - Node {i}", "add": f"10.0.0.{i % 250}", "port": "443",
+                       "id": "12345678-1234-1234-1234-123456789012", "net": "ws", "path": f"/p{i}"}
+            links.append("vmess://" + base64.b64encode(json.dumps(payload).encode()).decode())
+        elif kind == 1:
+            links.append(f"vless://12345678-1234-1234-1234-123456789012@10.1.0.{i % 250}:443"
+                         f"?security=tls&type=ws&path=%2Fv{i}#SG%20-%20Vless%20{i}")
+        else:
+            links.append(f"trojan://secret{i}@10.2.0.{i % 250}:443?sni=example.com#ID - Trojan {i}")
+    return "\n".join(links)
+
+def _template_with(outbounds):
+    return json.dumps({"log": {"level": "info"}, "outbounds": outbounds})
+
+def _bundled_template():
+    with open(TEMPLATE_PATH, encoding="utf-8") as f:
+        return f.read()
+
+TEMPLATES = {
+    "bundled": _bundled_template,
+    # Tanpa Internet / Best Latency / Lock Region ID: placeholder default yang diisi
+    "no_fill_selectors": lambda: _template_with([
+        {"type": "selector", "tag": "WhatsApp", "outbounds": ["direct", "Internet"]},
+        {"type": "direct", "tag": "direct"},
+    ]),
+    # Cuma Lock Region ID yang ada, Internet dan Best Latency dari placeholder
+    "only_lock_region": lambda: _template_with([
+        {"type": "selector", "tag": "Lock Region ID", "outbounds": ["stale"]},
+        {"type": "block", "tag": "block"},
+    ]),
+    # Internet tanpa Best Latency di list-nya, plus selector custom berisi tag basi dan duplikat
+    "custom_selectors": lambda: _template_with([
+        {"type": "selector", "tag": "Internet", "outbounds": ["direct"]},
+        {"type": "urltest", "tag": "Best Latency", "outbounds": []},
+        {"type": "selector", "tag": "Streaming", "outbounds": ["gone", "block", "direct", "block", "Internet"]},
+        {"type": "urltest", "tag": "Fallback", "outbounds": ["Best Latency"]},
+        {"type": "selector", "tag": "Option ADs", "outbounds": ["block"]},
+        {"type": "direct", "tag": "direct"},
+        {"type": "dns", "tag": "dns-out"},
+        {"type": "selector", "tag": "NoList"},
+    ]),
+    # Tanpa outbound default sama sekali
+    "no_defaults": lambda: _template_with([
+        {"type": "selector", "tag": "Internet", "outbounds": ["Best Latency", "direct"]},
+        {"type": "selector", "tag": "Games", "outbounds": []},
+    ]),
+}
+
+@pytest.mark.parametrize("link_count", [0, 1, 25])
+@pytest.mark.parametrize("template_name", sorted(TEMPLATES))
+def test_selector_order_matches_baseline(template_name, link_count):
+    template = TEMPLATES[template_name]()
+    result = singbox_converter.process_singbox_config(_links(link_count), template, dedup=False)
+    assert result["status"] == "success", result.get("message")
+    outbounds = json.loads(result["config_content"])["outbounds"]
+
+    # Parsing link bukan bagian yang dites: node hasil konversi diambil dari output, lalu disusun ulang baseline
+    converted = [o for o in outbounds if o.get("type") in CONVERTED_TYPES]
+    assert len(converted) == link_count
+    expected = _baseline_outbounds(copy.deepcopy(json.loads(template)["outbounds"]), copy.deepcopy(converted))
+
+    assert [o.get("tag") for o in outbounds] == [o.get("tag") for o in expected]
+    assert outbounds == expected
+
+def test_compiled_template_is_reusable():
+    # Template yang sama dipakai dua kali: rewrite pertama nggak boleh bocor ke konversi berikutnya
+    template = singbox_converter.CompiledTemplate(_bundled_template())
+    first = singbox_converter.process_singbox_config(_links(6), template, dedup=False)
+    second = singbox_converter.process_singbox_config(_links(3), template, dedup=False)
+    fresh = singbox_converter.process_singbox_config(_links(3), _bundled_template(), dedup=False)
+    assert first["status"] == second["status"] == "success"
+    assert second["config_content"] == fresh["config_content"]
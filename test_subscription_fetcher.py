@@ -0,0 +1,105 @@
+"""
+SubscriptionFetcher against a local HTTP stand-in server (http.server on 127.0.0.1):
+plain 200, 304 revalidation with ETag, gzip bodies and the body size cap.
+"""
+import base64
+import gzip
+import http.server
+import threading
+
+import pytest
+
+import subscription_fetcher
+
+LINKS = ["vless://u@1.2.3.4:443#A", "trojan://p@5.6.7.8:443#B"]
+BLOB = base64.b64encode("\n".join(LINKS).encode())
+ETAG = '"v1"'
+MAX_BODY_BYTES = 64 * 1024
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, body, headers=()):
+        self.send_response(200)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        if self.path == "/sub":
+            if self.headers.get("If-None-Match") == ETAG:
+                self.send_response(304)
+                self.send_header("ETag", ETAG)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self._send(BLOB, [("ETag", ETAG)])
+        elif self.path == "/gzip":
+            self._send(gzip.compress(BLOB), [("Content-Encoding", "gzip")])
+        elif self.path == "/big":
+            self._send(b"A" * (MAX_BODY_BYTES + 1))
+        elif self.path == "/big-unsized":
+            # Tanpa Content-Length: body dibaca sampai koneksi ditutup
+            self.send_response(200)
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.wfile.write(b"A" * (MAX_BODY_BYTES * 4))
+            self.close_connection = True
+        elif self.path == "/bomb":
+            self._send(gzip.compress(b"A" * (MAX_BODY_BYTES * 64)), [("Content-Encoding", "gzip")])
+        else:
+            self.send_error(404)
+
+@pytest.fixture
+def server():
+    httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    httpd.requests = []
+    thread = threading.Thread(target=httpd.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+@pytest.fixture
+def fetcher():
+    fetcher = subscription_fetcher.SubscriptionFetcher(allow_private_hosts=True, timeout=5,
+                                                       max_body_bytes=MAX_BODY_BYTES)
+    yield fetcher
+    fetcher.close()
+
+def _url(server, path):
+    return f"http://127.0.0.1:{server.server_address[1]}{path}"
+
+def test_fetch_and_revalidate_with_etag(server, fetcher):
+    first = fetcher.fetch(_url(server, "/sub"))
+    assert first["status"] == "success"
+    assert first["links"] == LINKS
+    second = fetcher.fetch(_url(server, "/sub"))
+    assert second["status"] == "not_modified"
+    assert second["links"] == LINKS
+
+def test_gzip_body(server, fetcher):
+    result = fetcher.fetch(_url(server, "/gzip"))
+    assert result["status"] == "success"
+    assert result["links"] == LINKS
+
+@pytest.mark.parametrize("path", ["/big", "/big-unsized", "/bomb"])
+def test_body_size_cap(server, fetcher, path):
+    result = fetcher.fetch(_url(server, path))
+    assert result["status"] == "error"
+    assert "batas" in result["message"]
+
+def test_private_hosts_blocked_by_default(server):
+    fetcher = subscription_fetcher.SubscriptionFetcher(timeout=5)
+    try:
+        result = fetcher.fetch(_url(server, "/sub"))
+    finally:
+        fetcher.close()
+    assert result["status"] == "error"
+    assert server.requests == []
@@ -0,0 +1,106 @@
+import collections
+import threading
+import time
+
+class _PendingLoad:
+    # Satu load yang sedang jalan untuk satu key; caller lain menunggu hasilnya
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.loaded = False # loader() selesai tanpa exception
+        self.stale = False
+
+class TTLCache:
+    """
+    Thread-safe in-process cache with a per-entry TTL and an LRU size bound.
+    Entries are invalidated per key, so one user's change never drops other users'
+    data. get_or_load() runs the loader once per key even when many callers miss at
+    the same time (no stampede); a None result is not cached.
+    """
+
+    def __init__(self, ttl, max_entries=1024, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries = collections.OrderedDict() # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._pending = {} # key -> _PendingLoad
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > self._clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value, ttl=None):
+        with self._lock:
+            self._put_locked(key, value, ttl)
+
+    def _put_locked(self, key, value, ttl=None):
+        self._entries[key] = (self._clock() + (self.ttl if ttl is None else ttl), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _invalidate_locked(self, key):
+        self._entries.pop(key, None)
+        # Load yang mulai sebelum invalidate bisa membawa data lama, jadi hasilnya tidak disimpan
+        pending = self._pending.get(key)
+        if pending is not None:
+            pending.stale = True
+
+    def invalidate(self, key):
+        with self._lock:
+            self._invalidate_locked(key)
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._entries) + list(self._pending):
+                self._invalidate_locked(key)
+
+    def get_or_load(self, key, loader):
+        """
+        Returns the cached value for key, or calls loader() and caches its result.
+        Concurrent callers missing the same key wait for that one load instead of
+        running their own. Exceptions from loader() propagate to its caller only;
+        the waiters then retry, so one of them runs its own loader.
+        """
+        while True:
+            value = self.get(key)
+            if value is not None:
+                return value
+            with self._lock:
+                pending = self._pending.get(key)
+                owner = pending is None
+                if owner:
+                    pending = self._pending[key] = _PendingLoad()
+            if owner:
+                break
+            pending.done.wait()
+            if pending.loaded:
+                return pending.value
+            # Loader sebelumnya raise (misal dibatalkan pemiliknya), bukan gagal: coba lagi dari awal
+
+        value = None
+        try:
+            value = loader()
+            pending.loaded = True
+        finally:
+            with self._lock:
+                del self._pending[key]
+                if value is not None and not pending.stale:
+                    self._put_locked(key, value)
+            pending.value = value
+            pending.done.set()
+        return value
+
+    def __len__(self):
+        return len(self._entries)